@@ -0,0 +1,169 @@
+"""Per-stage timing and accuracy benchmark on synthetic plates.
+
+    python benchmarks/bench_pipeline.py --megapixels 2 12 48 --repeat 3
+    python benchmarks/bench_pipeline.py --json new.json --baseline old.json
+
+For every plate size a synthetic plate with known spots is written to
+disk, then loaded, detected, measured, split into lanes and exported,
+timing each stage (median of --repeat runs). Detection accuracy is
+checked against the ground truth. With --baseline the run fails when a
+stage got slower than the tolerance allows or accuracy dropped.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tlc_densitometry  # noqa: E402
+import tlc_engine  # noqa: E402
+import tlc_synthetic  # noqa: E402
+from tlc_engine import DetectionParams  # noqa: E402
+
+STAGES = ["load", "detect", "features", "lanes", "export", "total"]
+
+# Stage times below this are too noisy to compare against a baseline
+MIN_COMPARABLE_SECONDS = 0.01
+
+# Largest accuracy losses tolerated against a baseline
+MAX_RECALL_DROP = 0.02
+MAX_PRECISION_DROP = 0.02
+MAX_RF_ERROR_INCREASE = 0.005
+
+
+def params_for(spec, detector):
+    # Area limits that bracket the generated spot sizes
+    return DetectionParams(min_area=int(0.5 * 3.1416 * spec.min_radius ** 2),
+                           max_area=int(2.0 * 3.1416 * spec.max_radius ** 2),
+                           num_lanes=spec.num_lanes, detector=detector)
+
+
+def run_once(path, params, csv_path):
+    # One pass through the headless pipeline; returns (times, blob_data)
+    times = {}
+    start = last = time.perf_counter()
+
+    def mark(stage):
+        nonlocal last
+        now = time.perf_counter()
+        times[stage] = now - last
+        last = now
+
+    img = tlc_engine.load_image(path)
+    mark("load")
+    keypoints, areas = tlc_engine.cached_keypoints(img, params)
+    mark("detect")
+    blob_data = tlc_engine.extract_spot_features(img, list(keypoints), params, areas)
+    mark("features")
+    lane_model = tlc_engine.lane_model_for(img, params)
+    blob_data, _ = tlc_engine.analyze_lanes(blob_data, img.shape[1], len(lane_model), lane_model)
+    tlc_densitometry.densitogram(img, params, lane_model)
+    mark("lanes")
+    blob_data.to_csv(csv_path, index=False)
+    mark("export")
+    times["total"] = time.perf_counter() - start
+    return times, blob_data
+
+
+def bench_size(megapixels, args, workdir):
+    spec = tlc_synthetic.PlateSpec.for_megapixels(
+        megapixels, num_lanes=args.lanes, spots_per_lane=args.spots, noise=args.noise,
+        gradient=args.gradient, seed=args.seed)
+    img, truth = tlc_synthetic.generate_plate(spec)
+    path = os.path.join(workdir, f"plate_{megapixels}mp.{args.format}")
+    cv2.imwrite(path, img)
+    del img
+
+    params = params_for(spec, args.detector)
+    runs = []
+    for _ in range(args.repeat):
+        times, blob_data = run_once(path, params, os.path.join(workdir, "spots.csv"))
+        runs.append(times)
+    accuracy = tlc_synthetic.match_spots(truth, blob_data)
+    return {
+        "megapixels": megapixels,
+        "shape": [spec.height, spec.width],
+        "detector": args.detector,
+        "stages": {stage: statistics.median(run[stage] for run in runs) for stage in STAGES},
+        "accuracy": accuracy,
+    }
+
+
+def print_table(results, file=sys.stdout):
+    header = f"{'MP':>5} {'size':>11} " + " ".join(f"{s:>9}" for s in STAGES)
+    header += f" {'recall':>7} {'prec':>6} {'Rf err':>7}"
+    print(header, file=file)
+    for r in results:
+        acc = r["accuracy"]
+        line = f"{r['megapixels']:>5g} {r['shape'][1]:>5}x{r['shape'][0]:<5} "
+        line += " ".join(f"{r['stages'][s] * 1000:>7.1f}ms" for s in STAGES)
+        line += f" {acc['recall']:>7.3f} {acc['precision']:>6.3f} {acc.get('rf_error', float('nan')):>7.4f}"
+        print(line, file=file)
+
+
+def compare(results, baseline, tolerance):
+    # Returns a list of regressions against a previous --json output
+    previous = {(r["megapixels"], r["detector"]): r for r in baseline}
+    problems = []
+    for r in results:
+        old = previous.get((r["megapixels"], r["detector"]))
+        if old is None:
+            continue
+        name = f"{r['megapixels']:g} MP"
+        for stage in STAGES:
+            before, now = old["stages"][stage], r["stages"][stage]
+            if before >= MIN_COMPARABLE_SECONDS and now > before * (1 + tolerance):
+                problems.append(f"{name} {stage}: {before * 1000:.1f}ms -> {now * 1000:.1f}ms")
+        acc, old_acc = r["accuracy"], old["accuracy"]
+        if acc["recall"] < old_acc["recall"] - MAX_RECALL_DROP:
+            problems.append(f"{name} recall: {old_acc['recall']:.3f} -> {acc['recall']:.3f}")
+        if acc["precision"] < old_acc["precision"] - MAX_PRECISION_DROP:
+            problems.append(f"{name} precision: {old_acc['precision']:.3f} -> "
+                            f"{acc['precision']:.3f}")
+        if acc.get("rf_error", 0.0) > old_acc.get("rf_error", 0.0) + MAX_RF_ERROR_INCREASE:
+            problems.append(f"{name} Rf error: {old_acc.get('rf_error', 0.0):.4f} -> "
+                            f"{acc['rf_error']:.4f}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the TLC pipeline on synthetic plates")
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[2, 12])
+    parser.add_argument("--lanes", type=int, default=6)
+    parser.add_argument("--spots", type=int, default=8, help="spots per lane")
+    parser.add_argument("--noise", type=float, default=4.0)
+    parser.add_argument("--gradient", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--detector", choices=list(tlc_engine.DETECTORS), default="blob")
+    parser.add_argument("--format", choices=["jpg", "png", "tif"], default="jpg")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", default=None, help="save results to this file")
+    parser.add_argument("--baseline", default=None, help="results of an earlier --json run")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative slowdown per stage against the baseline")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [bench_size(mp, args, workdir) for mp in args.megapixels]
+    print_table(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(results, json.load(f), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}", file=sys.stderr)
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,28 @@
+import numpy as np
+
+import tlc_engine
+import tlc_synthetic
+
+
+def test_fingerprint_covers_every_pixel():
+    img, _ = tlc_synthetic.generate_plate(tlc_synthetic.PlateSpec(seed=0))
+    edited = img.copy()
+    edited[1, 1] += 1
+    assert tlc_engine.image_fingerprint(edited) != tlc_engine.image_fingerprint(img)
+    assert (tlc_engine.image_fingerprint(img.astype(np.uint16))
+            != tlc_engine.image_fingerprint(img))
+
+
+def test_cache_sees_edited_image():
+    # A spot painted off every 16th row and column must not hit the cached
+    # detection of the unedited plate
+    img, _ = tlc_synthetic.generate_plate(tlc_synthetic.PlateSpec(seed=0))
+    params = tlc_engine.DetectionParams(threshold_min=0, threshold_max=0)
+    cache = tlc_engine.StageCache()
+    _, before = tlc_engine.detect_spots(img, params, cache=cache)
+    edited = img.copy()
+    yy, xx = np.mgrid[:img.shape[0], :img.shape[1]]
+    spot = (yy - 801) ** 2 + (xx - 61) ** 2 <= 15 ** 2
+    edited[spot & (yy % 16 != 0) & (xx % 16 != 0)] = 240
+    _, after = tlc_engine.detect_spots(edited, params, cache=cache)
+    assert len(after) > len(before)
@@ -0,0 +1,31 @@
+import cv2
+import numpy as np
+import pandas as pd
+import pytest
+
+import tlc_batch
+import tlc_engine
+import tlc_synthetic
+
+
+@pytest.mark.parametrize("dark_spots", [False, True])
+def test_batch_peaks_match_detection(tmp_path, dark_spots):
+    # invert_image means dark spots on a light plate for detection and lane
+    # peaks alike, so both find the same spots
+    img, _ = tlc_synthetic.generate_plate(tlc_synthetic.PlateSpec(dark_spots=dark_spots, seed=0))
+    path = str(tmp_path / "plate.png")
+    cv2.imwrite(path, img)
+    params = tlc_engine.DetectionParams(invert_image=dark_spots, num_lanes=4,
+                                        threshold_min=0, threshold_max=0)
+    output, peaks_output = tmp_path / "spots.csv", tmp_path / "peaks.csv"
+    _, failed, _ = tlc_batch.run_batch([path], params, str(output), workers=1,
+                                       peaks_output=str(peaks_output))
+    assert failed == 0
+
+    spots, peaks = pd.read_csv(output), pd.read_csv(peaks_output)
+    assert len(spots) == 20
+    assert len(peaks) == len(spots)
+    for lane in range(1, 5):
+        spot_rf = np.sort(spots.loc[spots["Lane"] == lane, "Rf"].to_numpy())
+        peak_rf = np.sort(peaks.loc[peaks["Lane"] == lane, "Rf"].to_numpy())
+        np.testing.assert_allclose(peak_rf, spot_rf, atol=0.005)
@@ -0,0 +1,45 @@
+import cv2
+import numpy as np
+import pytest
+
+import tlc_engine
+import tlc_synthetic
+
+
+@pytest.mark.parametrize("megapixels, num_lanes, dark_spots", [
+    (12, 4, False),
+    (48, 4, False),
+    (48, 10, False),
+    (12, 4, True),
+])
+def test_find_lanes_high_resolution(megapixels, num_lanes, dark_spots):
+    # The Lane Width slider (a densitometry band width in pixels) must not
+    # split lanes on plates whose lanes are many times wider
+    spec = tlc_synthetic.PlateSpec.for_megapixels(megapixels, num_lanes=num_lanes,
+                                                  dark_spots=dark_spots, seed=0)
+    img, truth = tlc_synthetic.generate_plate(spec)
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    for lane_width in (10, 50, 100):
+        params = tlc_engine.DetectionParams(auto_lanes=True, lane_width=lane_width,
+                                            invert_image=dark_spots)
+        lane_model = tlc_engine.find_lanes(gray, params)
+        assert len(lane_model) == num_lanes
+        lanes = lane_model.assign(truth["X"].to_numpy())
+        np.testing.assert_array_equal(lanes, truth["Lane"].to_numpy())
+
+
+@pytest.mark.parametrize("dark_spots", [False, True], ids=["light", "dark"])
+@pytest.mark.parametrize("num_lanes", [1, 2, 3, 5])
+@pytest.mark.parametrize("seed", [0, 1, 2, 3])
+def test_find_lanes_lane_count(num_lanes, dark_spots, seed):
+    # Few lanes give few autocorrelation peaks; a single lane's scattered
+    # spots must not be split into several lanes
+    spec = tlc_synthetic.PlateSpec.for_megapixels(2, num_lanes=num_lanes,
+                                                  dark_spots=dark_spots, seed=seed)
+    img, truth = tlc_synthetic.generate_plate(spec)
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    params = tlc_engine.DetectionParams(auto_lanes=True, invert_image=dark_spots)
+    lane_model = tlc_engine.find_lanes(gray, params)
+    assert len(lane_model) == num_lanes
+    lanes = lane_model.assign(truth["X"].to_numpy())
+    np.testing.assert_array_equal(lanes, truth["Lane"].to_numpy())
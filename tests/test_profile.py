@@ -0,0 +1,18 @@
+import numpy as np
+
+import tlc_profile
+
+
+def test_nested_span_keeps_outer_peak():
+    # An inner span resets tracemalloc's peak for itself; the outer span
+    # must still report what it allocated before the inner one started
+    with tlc_profile.recording(trace_memory=True) as timings:
+        with tlc_profile.span("outer"):
+            block = np.ones(16 * 1024 * 1024, dtype=np.uint8)
+            del block
+            with tlc_profile.span("inner"):
+                small = np.ones(1024, dtype=np.uint8)
+                del small
+    assert timings.span_peaks["outer"] >= 16
+    assert timings.span_peaks["inner"] < 16
+    assert "worker peak RSS MB" in timings.to_dict() or tlc_profile.resource is None
@@ -0,0 +1,80 @@
+import http.client
+import json
+import os
+import signal
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import cv2
+import pytest
+
+import tlc_server
+import tlc_synthetic
+
+
+@pytest.fixture(scope="module")
+def server():
+    service = tlc_server.AnalysisService(workers=1, batch_window=0.0)
+    server = tlc_server.make_server(0, service)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def post(server, body, headers=None):
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=60)
+    connection.putrequest("POST", "/analyze")
+    for name, value in (headers or {"Content-Length": str(len(body))}).items():
+        connection.putheader(name, value)
+    connection.endheaders(body)
+    response = connection.getresponse()
+    status, payload = response.status, json.loads(response.read())
+    connection.close()
+    return status, payload
+
+
+def plate_png():
+    img, _ = tlc_synthetic.generate_plate(tlc_synthetic.PlateSpec(width=300, height=400,
+                                                                  min_radius=6, max_radius=10))
+    return cv2.imencode(".png", img)[1].tobytes()
+
+
+def test_malformed_content_length(server):
+    status, payload = post(server, b"", {"Content-Length": "abc"})
+    assert status == 400
+    assert "Content-Length" in payload["error"]
+
+
+def test_crashed_batch_fails_its_requests():
+    task = Future()
+    task.set_exception(BrokenProcessPool("worker died"))
+    chunk = [(b"", None, False, Future()) for _ in range(2)]
+    tlc_server._resolver(chunk)(task)
+    for item in chunk:
+        with pytest.raises(BrokenProcessPool):
+            item[3].result(timeout=0)
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGKILL"), reason="needs SIGKILL")
+def test_pool_restarts_after_worker_crash(server):
+    body = plate_png()
+    assert post(server, body)[0] == 200
+
+    service = server.service
+    executor = service.executor
+    for process in list(executor._processes.values()):
+        os.kill(process.pid, signal.SIGKILL)
+    # The pool notices the dead worker on its own and marks itself broken
+    deadline = time.time() + 30
+    while not executor._broken and time.time() < deadline:
+        time.sleep(0.05)
+
+    status, payload = post(server, body)
+    assert status == 200, payload
+    assert service.executor is not executor
+    assert service.stats.to_dict()["pool_restarts"] == 1
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import tlc_engine
+import tlc_synthetic
+import tlc_tiles
+
+
+@pytest.mark.parametrize("dark_spots", [False, True], ids=["light", "dark"])
+@pytest.mark.parametrize("detector", ["blob", "contours"])
+def test_tiled_background_matches_whole_image(detector, dark_spots):
+    # Tiles are flattened with their part of the background the whole image
+    # gets, so a single tile reproduces whole-image detection exactly and
+    # smaller tiles find the same spots
+    img, _ = tlc_synthetic.generate_plate(tlc_synthetic.PlateSpec(dark_spots=dark_spots, seed=0))
+    params = tlc_engine.DetectionParams(detector=detector, invert_image=dark_spots,
+                                        threshold_min=0, threshold_max=0,
+                                        background_correction=True)
+    _, whole = tlc_engine.detect_spots(img, params)
+    assert len(whole) == 20
+
+    _, single, _ = tlc_tiles.detect_spots_tiled(img, params, tile_size=2000, workers=1)
+    pd.testing.assert_frame_equal(single.reset_index(drop=True), whole.reset_index(drop=True))
+
+    _, tiled, _ = tlc_tiles.detect_spots_tiled(img, params, tile_size=400, workers=2)
+    assert len(tiled) == len(whole)
+    order = np.lexsort((tiled["X"], tiled["Y"]))
+    expected = np.lexsort((whole["X"], whole["Y"]))
+    np.testing.assert_array_equal(tiled["X"].to_numpy()[order], whole["X"].to_numpy()[expected])
+    np.testing.assert_array_equal(tiled["Y"].to_numpy()[order], whole["Y"].to_numpy()[expected])
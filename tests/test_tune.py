@@ -0,0 +1,20 @@
+import cv2
+import numpy as np
+import pandas as pd
+
+import tlc_tune
+
+
+def test_tune_fails_when_no_spot_is_found(tmp_path):
+    # A flat plate annotated with one spot: no candidate can score, so no
+    # parameter file is written and the exit status reports the failure
+    path = tmp_path / "blank.png"
+    cv2.imwrite(str(path), np.full((400, 300, 3), 30, dtype=np.uint8))
+    truth = tmp_path / "truth.csv"
+    pd.DataFrame({"Image": ["blank.png"], "X": [150], "Y": [200], "Area": [300]}).to_csv(
+        truth, index=False)
+    output = tmp_path / "best.json"
+    status = tlc_tune.main([str(path), "--truth", str(truth), "-o", str(output),
+                            "--rounds", "0", "-j", "1"])
+    assert status == 1
+    assert not output.exists()
@@ -0,0 +1,280 @@
+"""Batch processing of plate images with a process pool."""
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import cv2
+import pandas as pd
+
+import tlc_densitometry
+import tlc_engine
+import tlc_export
+import tlc_profile
+import tlc_store
+import tlc_tiles
+from tlc_engine import DetectionParams
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff")
+
+
+def find_images(inputs):
+    # Expand files, directories and glob patterns into a sorted, de-duplicated list
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for name in sorted(os.listdir(item)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    paths.append(os.path.join(item, name))
+        elif os.path.isfile(item):
+            paths.append(item)
+        else:
+            paths.extend(p for p in sorted(glob.glob(item))
+                         if p.lower().endswith(IMAGE_EXTENSIONS))
+
+    seen = set()
+    unique = []
+    for path in paths:
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            unique.append(path)
+    return unique
+
+
+def add_param_arguments(parser):
+    # One command-line flag per DetectionParams field, plus a JSON parameter file
+    defaults = DetectionParams()
+    parser.add_argument("--params", help="JSON file with detection parameters")
+    for name, value in defaults.to_dict().items():
+        flag = "--" + name.replace("_", "-")
+        if isinstance(value, bool):
+            parser.add_argument(flag, dest=name, type=int, choices=[0, 1], default=None)
+        elif name == "detector":
+            parser.add_argument(flag, dest=name, choices=list(tlc_engine.DETECTORS), default=None)
+        else:
+            parser.add_argument(flag, dest=name, type=type(value), default=None)
+
+
+def params_from_args(args):
+    values = {}
+    if args.params:
+        with open(args.params) as f:
+            values.update(json.load(f))
+    defaults = DetectionParams().to_dict()
+    for name, default in defaults.items():
+        value = getattr(args, name, None)
+        if value is not None:
+            values[name] = value
+        # Switches come as 0/1 from flags (and maybe parameter files); as
+        # bools they hash like the GUI's parameters in tlc_store
+        if isinstance(default, bool) and name in values:
+            values[name] = bool(values[name])
+    return DetectionParams.from_dict(values)
+
+
+def _init_worker():
+    # One OpenCV thread per process; the pool already uses every core
+    cv2.setNumThreads(1)
+
+
+def process_image(path, params, peaks=False, trace_memory=False):
+    # Runs in a worker process; returns only picklable results:
+    # (path, blob_data, peak_data, error, timings), timings a tlc_profile.Timings.
+    # trace_memory adds the allocation peak of every stage (slower).
+    with tlc_profile.recording(trace_memory=trace_memory) as timings:
+        img = tlc_engine.load_image(path)
+        if img is None:
+            return path, None, None, "failed to load image", timings
+        try:
+            _, blob_data, _ = tlc_engine.analyze_image(img, params)
+            peak_data = None
+            if peaks:
+                lane_model = tlc_engine.lane_model_for(img, params)
+                peak_data = tlc_densitometry.densitogram(img, params, lane_model)[2]
+        except Exception as e:
+            return path, None, None, str(e), timings
+    return path, blob_data, peak_data, None, timings
+
+
+def process_image_tiled(path, params, tile_size, workers, trace_memory=False):
+    # Large scans: one image at a time, tiles spread over worker threads.
+    # Lane profiles need whole columns, so they are not computed here.
+    # Tile threads do not record spans of their own, so the whole tiled
+    # detection is one span.
+    with tlc_profile.recording(trace_memory=trace_memory) as timings:
+        try:
+            with tlc_profile.span("tiled detection"):
+                _, blob_data, shape = tlc_tiles.detect_spots_tiled(path, params,
+                                                                   tile_size=tile_size,
+                                                                   workers=workers)
+            if params.num_lanes > 1 and len(blob_data) > 0:
+                # Equal-width lanes only; run_batch rejects automatic lanes
+                blob_data, _ = tlc_engine.analyze_lanes(blob_data, shape[1], params.num_lanes)
+        except Exception as e:
+            return path, None, None, str(e), timings
+    return path, blob_data, None, None, timings
+
+
+def check_tiled(params, peaks_output=None):
+    # Lane profiles and automatic lanes need whole image columns, which
+    # tiled detection never holds in memory
+    if peaks_output:
+        raise ValueError("lane peaks need whole images and cannot be combined with tiles")
+    if params.auto_lanes:
+        raise ValueError("automatic lanes need whole images and cannot be combined with "
+                         "tiles; use equal-width lanes (num_lanes)")
+
+
+def iter_results(paths, params, workers, tile_size=None, peaks=False, trace_memory=False):
+    # Yields (path, blob_data, peaks, error, timings) in input order
+    if tile_size:
+        # Tiled mode keeps a single scan in memory at a time
+        for path in paths:
+            yield process_image_tiled(path, params, tile_size, workers, trace_memory)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        # Small chunks keep every worker busy while results stream back in order
+        chunksize = max(1, len(paths) // (workers * 8))
+        yield from executor.map(partial(process_image, params=params, peaks=peaks,
+                                        trace_memory=trace_memory),
+                                paths, chunksize=chunksize)
+
+
+class ResultWriter:
+    # Streams per-image results into the combined output (plus the optional
+    # peaks output and results store), applying the reference library and
+    # the calibration on the way. The output format follows the extension
+    # (see tlc_export). append=True keeps existing CSV rows. With
+    # timings_output, every plate's timing record goes to a CSV as well.
+    def __init__(self, output, params, peaks_output=None, calibration=None, library=None,
+                 store=None, append=False, timings_output=None):
+        self.params = params
+        self.calibration = calibration
+        self.library = library
+        self.store = store
+        self.params_key = None
+        if store is not None:
+            self.params_key = tlc_store.parameter_hash(params, calibration, library)
+
+        self.out = tlc_export.open_writer(output, append)
+        self.peaks_out = tlc_export.open_writer(peaks_output, append) if peaks_output else None
+        self.spots = 0
+
+        # Timing records are kept until close(), as the stage columns are
+        # only known once every plate has been seen
+        self.timings_output = timings_output
+        self.timing_records = []
+        self.stage_totals = tlc_profile.Timings()
+
+    def add_timings(self, path, timings):
+        if timings is None:
+            return
+        self.stage_totals.merge(timings)
+        if self.timings_output:
+            self.timing_records.append(dict(Image=os.path.basename(path), **timings.to_dict()))
+
+    def is_stored(self, image_hash):
+        return self.store is not None and self.store.has_results(image_hash, self.params_key)
+
+    def write(self, path, blob_data, peak_data=None, image_hash=None, timings=None):
+        if timings is None:
+            timings = tlc_profile.Timings()
+        with tlc_profile.recording(timings), tlc_profile.span("annotate"):
+            blob_data = self.annotate(blob_data)
+        with tlc_profile.recording(timings), tlc_profile.span("export"):
+            self.export(path, blob_data, peak_data, image_hash)
+        self.add_timings(path, timings)
+
+    def annotate(self, blob_data):
+        if self.library is not None:
+            blob_data = self.library.annotate(blob_data)
+        if self.calibration is not None:
+            blob_data = self.calibration.apply(blob_data)
+        return blob_data
+
+    def export(self, path, blob_data, peak_data=None, image_hash=None):
+        if self.store is not None and image_hash is not None:
+            self.store.add_plate(path, image_hash, self.params_key, self.params, blob_data)
+
+        blob_data.insert(0, "Image", os.path.basename(path))
+        self.out.write(blob_data)
+        self.spots += len(blob_data)
+
+        if self.peaks_out is not None and peak_data is not None:
+            peak_data.insert(0, "Image", os.path.basename(path))
+            self.peaks_out.write(peak_data)
+
+    def close(self):
+        self.out.close()
+        if self.peaks_out is not None:
+            self.peaks_out.close()
+        if self.timings_output:
+            # Stage columns first, totals last
+            records = pd.DataFrame(self.timing_records)
+            last = [c for c in ("total ms", "worker peak RSS MB") if c in records.columns]
+            records = records[[c for c in records.columns if c not in last] + last]
+            records.to_csv(self.timings_output, index=False)
+
+
+def run_batch(paths, params, output, workers=None, tile_size=None, peaks_output=None,
+              calibration=None, library=None, store=None, timings_output=None,
+              trace_memory=False, log=sys.stderr):
+    # calibration (tlc_calibration.Calibration) and library
+    # (tlc_library.ReferenceLibrary) are optional and applied to every plate.
+    # With a tlc_store.ResultStore, images that already have results for
+    # these settings are skipped and new results are added to the store.
+    # trace_memory adds per-stage allocation peaks to the timing records.
+    if tile_size:
+        check_tiled(params, peaks_output)
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    writer = ResultWriter(output, params, peaks_output, calibration, library, store,
+                          timings_output=timings_output)
+
+    skipped = 0
+    hashes = {}
+    if store is not None:
+        pending = []
+        for path in paths:
+            try:
+                hashes[path] = store.image_hash(path)
+            except OSError:
+                # Let the worker report the unreadable file
+                pending.append(path)
+                continue
+            if writer.is_stored(hashes[path]):
+                skipped += 1
+            else:
+                pending.append(path)
+        paths = pending
+
+    done = 0
+    failed = 0
+    try:
+        results = iter_results(paths, params, workers, tile_size,
+                               peaks=writer.peaks_out is not None, trace_memory=trace_memory)
+        for path, blob_data, peak_data, error, timings in results:
+            done += 1
+            if error is not None:
+                failed += 1
+                writer.add_timings(path, timings)
+                print(f"{path}: {error}", file=log)
+                continue
+            writer.write(path, blob_data, peak_data, hashes.get(path), timings)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    rate = done / elapsed if elapsed > 0 else 0.0
+    print(f"Processed {done} images ({failed} failed, {writer.spots} spots) in {elapsed:.2f}s "
+          f"- {rate:.2f} images/s with {workers} workers", file=log)
+    if done:
+        print(f"Stage time over all images: {writer.stage_totals.summary()}", file=log)
+    if store is not None:
+        print(f"Skipped {skipped} images with stored results in {store.file_path}", file=log)
+    return done, failed, writer.spots
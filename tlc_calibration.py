@@ -0,0 +1,253 @@
+"""Concentration calibration from standard spots.
+
+Standard spots with known concentrations are fitted to a response curve
+per compound and Rf window. A fitted calibration is saved as JSON and
+applied to whole spot tables at once, so a calibrated batch costs one fit
+plus one vectorized evaluation per plate.
+"""
+import argparse
+import json
+import sys
+from dataclasses import dataclass, asdict
+
+import numpy as np
+import pandas as pd
+
+MODELS = ("linear", "polynomial", "michaelis_menten")
+DEFAULT_RESPONSE = "Integrated Intensity"
+
+# Half-width of the Rf window around the standards of one compound
+DEFAULT_RF_TOLERANCE = 0.05
+
+# Size of the lookup table used to invert polynomial curves
+INVERSE_GRID_POINTS = 4096
+
+CALIBRATION_VERSION = 1
+
+
+def fit_linear(conc, response):
+    # response = slope * conc + intercept
+    return np.polyfit(conc, response, 1).tolist()
+
+
+def fit_polynomial(conc, response, degree=2):
+    # Highest power first, as np.polyval expects; the degree is lowered
+    # when there are not enough distinct concentrations for it
+    degree = max(1, min(degree, len(np.unique(conc)) - 1))
+    return np.polyfit(conc, response, degree).tolist()
+
+
+def fit_michaelis_menten(conc, response, iterations=100, tolerance=1e-10):
+    # response = vmax * conc / (km + conc), least squares with a damped
+    # Gauss-Newton (Levenberg-Marquardt) iteration; NumPy only
+    vmax = 1.2 * response.max()
+    km = max(float(np.median(conc)), 1e-9)
+    cost = np.sum((response - vmax * conc / (km + conc)) ** 2)
+    damping = 1e-3
+    for _ in range(iterations):
+        denom = km + conc
+        jacobian = np.column_stack([conc / denom, -vmax * conc / denom ** 2])
+        residual = response - vmax * conc / denom
+        normal = jacobian.T @ jacobian
+        try:
+            step = np.linalg.solve(normal + damping * np.diag(np.diag(normal) + 1e-12),
+                                   jacobian.T @ residual)
+        except np.linalg.LinAlgError:
+            break
+
+        new_vmax, new_km = vmax + step[0], km + step[1]
+        if new_km <= 0:
+            damping *= 10
+            continue
+        new_cost = np.sum((response - new_vmax * conc / (new_km + conc)) ** 2)
+        if new_cost < cost:
+            converged = cost - new_cost <= tolerance * cost
+            vmax, km, cost = new_vmax, new_km, new_cost
+            damping /= 10
+            if converged:
+                break
+        else:
+            damping *= 10
+    return [float(vmax), float(km)]
+
+
+@dataclass
+class CalibrationCurve:
+    # Fitted response curve of one compound, valid for spots in an Rf window
+    compound: str
+    model: str
+    coefficients: list
+    rf_min: float
+    rf_max: float
+    response: str = DEFAULT_RESPONSE
+    conc_min: float = 0.0
+    conc_max: float = 1.0
+    r_squared: float = float("nan")
+    n_points: int = 0
+
+    def predict(self, conc):
+        # Expected response for the given concentrations
+        conc = np.asarray(conc, dtype=np.float64)
+        if self.model == "michaelis_menten":
+            vmax, km = self.coefficients
+            return vmax * conc / (km + conc)
+        return np.polyval(self.coefficients, conc)
+
+    def concentration(self, response):
+        # Inverse of predict for a whole array of responses. Linear and
+        # Michaelis-Menten curves are inverted analytically; polynomials with
+        # a monotonic lookup table over the calibrated range, returning NaN
+        # outside of it.
+        response = np.asarray(response, dtype=np.float64)
+        if self.model == "linear":
+            slope, intercept = self.coefficients
+            return (response - intercept) / slope if slope != 0 else np.full(response.shape, np.nan)
+        if self.model == "michaelis_menten":
+            vmax, km = self.coefficients
+            with np.errstate(divide="ignore", invalid="ignore"):
+                conc = km * response / (vmax - response)
+            return np.where((response >= 0) & (response < vmax), conc, np.nan)
+
+        grid = np.linspace(min(0.0, self.conc_min), self.conc_max, INVERSE_GRID_POINTS)
+        values = self.predict(grid)
+        if values[-1] < values[0]:
+            grid, values = grid[::-1], values[::-1]
+        # Only the rising part of the curve can be inverted unambiguously
+        values = np.maximum.accumulate(values)
+        return np.interp(response, values, grid, left=np.nan, right=np.nan)
+
+
+def fit_curve(compound, conc, response, model="linear", rf_min=0.0, rf_max=1.0,
+              response_column=DEFAULT_RESPONSE, degree=2):
+    conc = np.asarray(conc, dtype=np.float64)
+    response = np.asarray(response, dtype=np.float64)
+    if model not in MODELS:
+        raise ValueError(f"unknown calibration model {model!r}, expected one of {', '.join(MODELS)}")
+    needed = 3 if model == "michaelis_menten" else 2
+    if len(np.unique(conc)) < needed:
+        raise ValueError(f"{compound}: a {model} fit needs at least {needed} "
+                         f"different concentrations")
+
+    if model == "linear":
+        coefficients = fit_linear(conc, response)
+    elif model == "polynomial":
+        coefficients = fit_polynomial(conc, response, degree)
+    else:
+        coefficients = fit_michaelis_menten(conc, response)
+
+    curve = CalibrationCurve(compound=str(compound), model=model, coefficients=coefficients,
+                             rf_min=float(rf_min), rf_max=float(rf_max),
+                             response=response_column,
+                             conc_min=float(conc.min()), conc_max=float(conc.max()),
+                             n_points=len(conc))
+    total = np.sum((response - response.mean()) ** 2)
+    residual = np.sum((response - curve.predict(conc)) ** 2)
+    curve.r_squared = float(1.0 - residual / total) if total > 0 else 1.0
+    return curve
+
+
+class Calibration:
+    # A set of calibration curves; the first curve whose Rf window contains
+    # a spot is used for it
+    def __init__(self, curves=None):
+        self.curves = list(curves or [])
+
+    def __len__(self):
+        return len(self.curves)
+
+    @classmethod
+    def fit(cls, standards, model="linear", response=DEFAULT_RESPONSE,
+            rf_tolerance=DEFAULT_RF_TOLERANCE, degree=2):
+        # standards is a spot table with added "Concentration" and (optional)
+        # "Compound" columns - e.g. an exported spot table with the standard
+        # spots annotated. "Rf Min"/"Rf Max" columns override the Rf window.
+        missing = [c for c in ("Concentration", "Rf", response) if c not in standards.columns]
+        if missing:
+            raise ValueError(f"standards are missing the column(s): {', '.join(missing)}")
+        standards = standards.dropna(subset=["Concentration", "Rf", response])
+        if "Compound" not in standards.columns:
+            standards = standards.assign(Compound="Standard")
+
+        curves = []
+        for compound, group in standards.groupby("Compound", sort=False):
+            rf = group["Rf"].to_numpy(dtype=np.float64)
+            rf_min = group["Rf Min"].min() if "Rf Min" in group else rf.min() - rf_tolerance
+            rf_max = group["Rf Max"].max() if "Rf Max" in group else rf.max() + rf_tolerance
+            curves.append(fit_curve(compound, group["Concentration"], group[response], model,
+                                    rf_min, rf_max, response, degree))
+        return cls(curves)
+
+    def apply(self, blob_data):
+        # Returns a copy of the spot table with "Concentration" and the name of
+        # the "Calibration" curve used; spots outside every window get NaN
+        conc = np.full(len(blob_data), np.nan)
+        names = np.full(len(blob_data), "", dtype=object)
+        if len(blob_data) > 0:
+            rf = blob_data["Rf"].to_numpy(dtype=np.float64)
+            claimed = np.zeros(len(blob_data), dtype=bool)
+            for curve in self.curves:
+                mask = ~claimed & (rf >= curve.rf_min) & (rf <= curve.rf_max)
+                if not mask.any():
+                    continue
+                response = blob_data[curve.response].to_numpy(dtype=np.float64)[mask]
+                conc[mask] = curve.concentration(response)
+                names[mask] = curve.compound
+                claimed |= mask
+
+        blob_data = blob_data.copy()
+        blob_data["Concentration"] = np.round(conc, 4)
+        blob_data["Calibration"] = names
+        return blob_data
+
+    def to_dict(self):
+        return {"version": CALIBRATION_VERSION, "curves": [asdict(c) for c in self.curves]}
+
+    @classmethod
+    def from_dict(cls, values):
+        known = CalibrationCurve.__dataclass_fields__
+        return cls([CalibrationCurve(**{k: v for k, v in curve.items() if k in known})
+                    for curve in values.get("curves", [])])
+
+    def save(self, file_path):
+        with open(file_path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, file_path):
+        with open(file_path) as f:
+            return cls.from_dict(json.load(f))
+
+    def summary(self):
+        # One line per curve, for the GUI and the command line
+        return "\n".join(
+            f"{c.compound}: {c.model}, Rf {c.rf_min:.2f}-{c.rf_max:.2f}, "
+            f"{c.n_points} standards, R² = {c.r_squared:.4f}"
+            for c in self.curves)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit a TLC calibration from standard spots")
+    parser.add_argument("standards", help="CSV spot table with Concentration (and Compound) columns")
+    parser.add_argument("-o", "--output", default="calibration.json",
+                        help="where to save the fitted calibration")
+    parser.add_argument("--model", choices=MODELS, default="linear")
+    parser.add_argument("--degree", type=int, default=2, help="polynomial degree")
+    parser.add_argument("--response", default=DEFAULT_RESPONSE,
+                        help="spot table column used as the detector response")
+    parser.add_argument("--rf-tolerance", type=float, default=DEFAULT_RF_TOLERANCE,
+                        help="Rf window half-width around each compound's standards")
+    args = parser.parse_args(argv)
+
+    try:
+        calibration = Calibration.fit(pd.read_csv(args.standards), args.model, args.response,
+                                      args.rf_tolerance, args.degree)
+    except (OSError, ValueError) as e:
+        print(f"{args.standards}: {e}", file=sys.stderr)
+        return 1
+    calibration.save(args.output)
+    print(calibration.summary())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,187 @@
+"""Densitometric lane profiles.
+
+Each lane band is reduced to a 1D intensity profile along the migration
+axis, baseline corrected, and its peaks are located and integrated. All
+steps operate on a (height, lanes) array, so every lane is analysed in
+the same NumPy pass.
+"""
+import cv2
+import numpy as np
+import pandas as pd
+
+import tlc_engine
+from tlc_profile import span
+
+PEAK_COLUMNS = ["Lane", "Peak #", "Rf", "Y", "Height", "Area", "Area %",
+                "Start Rf", "End Rf"]
+
+
+def lane_bands(centers, lane_width, img_width):
+    # Column indices of every band, shape (lanes, lane_width)
+    offsets = np.arange(lane_width) - lane_width // 2
+    cols = np.round(np.asarray(centers, dtype=np.float64)[:, None] + offsets[None, :])
+    return np.clip(cols, 0, img_width - 1).astype(np.intp)
+
+
+def lane_profiles(gray, centers, lane_width, dark_spots=True):
+    # Mean band intensity per row: one gather + one reduction for all lanes.
+    # Dark spots are flipped so that more material always means a higher signal.
+    cols = lane_bands(centers, max(1, lane_width), gray.shape[1])
+    profiles = gray[:, cols].mean(axis=2, dtype=np.float64)
+    if dark_spots:
+        profiles = 255.0 - profiles
+    return profiles
+
+
+def smooth_profiles(profiles, window):
+    # Moving average along the migration axis via cumulative sums
+    if window <= 1:
+        return profiles
+    pad = window // 2
+    padded = np.pad(profiles, ((pad, window - 1 - pad), (0, 0)), mode="edge")
+    cum = np.cumsum(padded, axis=0)
+    cum = np.vstack([np.zeros((1, profiles.shape[1])), cum])
+    return (cum[window:] - cum[:-window]) / window
+
+
+def estimate_baseline(profiles, window):
+    # Rolling-minimum baseline (morphological opening) along each lane;
+    # peaks narrower than the window are removed, slow drifts are kept
+    window = max(3, int(window) | 1)
+    kernel = np.ones((window, 1), dtype=np.uint8)
+    data = profiles.astype(np.float32)
+    opened = cv2.dilate(cv2.erode(data, kernel, borderType=cv2.BORDER_REPLICATE),
+                        kernel, borderType=cv2.BORDER_REPLICATE)
+    return opened.astype(np.float64)
+
+
+def find_peaks(signal, min_distance=5, min_height=2.0, rel_height=0.1, min_drop=0.1):
+    # Local maxima above an absolute floor and a fraction of each lane's
+    # maximum; returns (rows, lanes) index arrays sorted by lane then row
+    floor = np.maximum(min_height, rel_height * signal.max(axis=0))
+
+    # Non-maximum suppression along each lane with a dilation
+    window = 2 * max(1, int(min_distance)) + 1
+    data = signal.astype(np.float32)
+    local_max = cv2.dilate(data, np.ones((window, 1), dtype=np.uint8),
+                           borderType=cv2.BORDER_REPLICATE)
+    is_peak = (data >= local_max) & (signal >= floor[None, :])
+    # Only the first row of a flat top counts
+    is_peak[1:] &= signal[1:] > signal[:-1]
+    is_peak[[0, -1]] = False
+    lanes, rows = np.nonzero(is_peak.T)
+
+    # Merge neighbouring peaks that are not separated by a real valley
+    # (e.g. noise on the plateau of a saturated spot): the minimum between
+    # two consecutive peaks of a lane must drop min_drop below the lower one
+    height = signal.shape[0]
+    flat = signal.T.ravel()
+    while len(rows) > 1:
+        pos = lanes * height + rows
+        valleys = np.minimum.reduceat(flat, pos)[:-1]
+        peak_a, peak_b = flat[pos[:-1]], flat[pos[1:]]
+        lower = np.minimum(peak_a, peak_b)
+        shallow = (lanes[:-1] == lanes[1:]) & (valleys > lower - min_drop * np.abs(lower))
+        if not shallow.any():
+            break
+        # Drop the lower peak of each shallow pair (once per pass)
+        drop = np.zeros(len(rows), dtype=bool)
+        pairs = np.flatnonzero(shallow)
+        drop[np.where(peak_a[pairs] < peak_b[pairs], pairs, pairs + 1)] = True
+        rows, lanes = rows[~drop], lanes[~drop]
+    return rows, lanes
+
+
+def valley_positions(signal, rows, lanes):
+    # Row of the lowest point between each pair of consecutive peaks,
+    # found for all pairs at once on the lane-major flattened signal
+    height = signal.shape[0]
+    flat = signal.T.ravel()
+    if len(rows) < 2:
+        return np.zeros(0, dtype=np.intp)
+    pos = lanes * height + rows
+    lengths = np.diff(pos)
+    minima = np.minimum.reduceat(flat, pos)[:-1]
+
+    span = np.arange(pos[0], pos[-1])
+    segment = np.repeat(np.arange(len(lengths)), lengths)
+    candidates = np.where(flat[span] == minima[segment], span, np.iinfo(np.intp).max)
+    first = np.minimum.reduceat(candidates, pos[:-1] - pos[0])
+    return first - lanes[:-1] * height
+
+
+def integrate_peaks(signal, rows, lanes, min_floor=0.5):
+    # Each peak extends until the signal returns to the lane's noise floor,
+    # or to the lowest point between it and a neighbouring peak; the areas
+    # come from per-lane cumulative sums, so no Python loop over peaks
+    height = signal.shape[0]
+    idx = np.arange(height)[:, None]
+    floor = np.maximum(min_floor, 2.0 * np.median(np.abs(signal), axis=0))
+    quiet = signal <= floor[None, :]
+
+    left = np.maximum.accumulate(np.where(quiet, idx, 0), axis=0)
+    right = np.minimum.accumulate(np.where(quiet, idx, height - 1)[::-1], axis=0)[::-1]
+    starts = left[rows, lanes]
+    ends = right[rows, lanes]
+
+    # Neighbouring peaks in the same lane split at the valley between them
+    valleys = valley_positions(signal, rows, lanes)
+    same_lane = lanes[:-1] == lanes[1:]
+    ends[:-1] = np.where(same_lane, np.minimum(ends[:-1], valleys), ends[:-1])
+    starts[1:] = np.where(same_lane, np.maximum(starts[1:], valleys), starts[1:])
+
+    # Area and intensity-weighted centroid of every peak window
+    positive = np.clip(signal, 0, None)
+    zeros = np.zeros((1, signal.shape[1]))
+    cum = np.vstack([zeros, np.cumsum(positive, axis=0)])
+    cum_moment = np.vstack([zeros, np.cumsum(positive * idx, axis=0)])
+    areas = cum[ends + 1, lanes] - cum[starts, lanes]
+    moments = cum_moment[ends + 1, lanes] - cum_moment[starts, lanes]
+    centroids = np.where(areas > 0, moments / np.where(areas > 0, areas, 1), rows)
+    return starts, ends, areas, centroids
+
+
+def densitogram(img, params, lane_model=None, smooth=5, baseline_window=None, gray=None):
+    # Returns (profiles, baselines, peaks) for every lane of the plate.
+    # profiles and baselines have shape (height, lanes); peaks is a table
+    # with one row per integrated peak.
+    with span("densitometry"):
+        if gray is None:
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        height, width = gray.shape[:2]
+        if lane_model is None:
+            lane_model = tlc_engine.LaneModel.uniform(width, params.num_lanes)
+        num_lanes = len(lane_model)
+        lane_width = min(params.lane_width, max(1, int(lane_model.band_width())))
+
+        # Dark spots on a light plate are what the invert option is for
+        profiles = smooth_profiles(lane_profiles(gray, lane_model.centers, lane_width,
+                                                 dark_spots=params.invert_image), smooth)
+        if baseline_window is None:
+            # Wider than the largest allowed spot so whole peaks are removed
+            baseline_window = 4 * np.sqrt(params.max_area / np.pi)
+        baselines = estimate_baseline(profiles, min(baseline_window, height))
+        signal = profiles - baselines
+
+        # Peaks closer than the radius of the smallest allowed spot are one spot
+        rows, lanes = find_peaks(signal, min_distance=np.sqrt(params.min_area / np.pi))
+        starts, ends, areas, centroids = integrate_peaks(signal, rows, lanes)
+        centers_y = np.round(centroids).astype(np.int64)
+
+        lane_totals = np.bincount(lanes, weights=areas, minlength=num_lanes)
+        peak_nums = np.arange(len(rows)) - np.searchsorted(lanes, lanes) + 1
+        with np.errstate(invalid="ignore", divide="ignore"):
+            area_pct = np.where(lane_totals[lanes] > 0, 100.0 * areas / lane_totals[lanes], 0.0)
+
+        peaks = pd.DataFrame({
+            "Lane": lanes + 1,
+            "Peak #": peak_nums,
+            "Rf": tlc_engine.rf_values(centroids, height),
+            "Y": centers_y,
+            "Height": np.round(signal[rows, lanes], 2),
+            "Area": np.round(areas, 1),
+            "Area %": np.round(area_pct, 2),
+            "Start Rf": tlc_engine.rf_values(ends, height),
+            "End Rf": tlc_engine.rf_values(starts, height),
+        }, columns=PEAK_COLUMNS)
+        return profiles, baselines, peaks
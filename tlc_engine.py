@@ -0,0 +1,767 @@
+"""Headless TLC analysis engine.
+
+Everything in here works on plain NumPy images and a DetectionParams
+instance, so it can run without Tk, a display or matplotlib. pandas is
+only imported once the first spot table is built, which keeps it off
+the GUI's startup path.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, asdict, replace
+
+import cv2
+import numpy as np
+
+from tlc_profile import span
+
+SPOT_COLUMNS = ["Spot #", "Lane", "Rf", "X", "Y",
+                "Area", "Saturation", "Hue", "Value",
+                "Median Saturation", "Integrated Intensity",
+                "Rel Conc"]
+
+# Fixed column types of the spot table. Pixel positions and counts are
+# 32-bit integers. The measurements stay double: they are rounded to a few
+# decimals, and float32 would turn 113.8 into 113.80000305 in every JSON,
+# SQLite and Parquet output.
+SPOT_DTYPES = {
+    "Spot #": np.int32,
+    "Lane": np.int32,
+    "Rf": np.float64,
+    "X": np.int32,
+    "Y": np.int32,
+    "Area": np.float64,
+    "Saturation": np.float64,
+    "Hue": np.float64,
+    "Value": np.float64,
+    "Median Saturation": np.float64,
+    "Integrated Intensity": np.float64,
+    "Rel Conc": np.float64,
+}
+
+# Upper bound on candidate pixels gathered at once by region_stats
+REGION_CHUNK_PIXELS = 1 << 22
+
+# Images larger than this are previewed on a downscaled copy while tuning
+PREVIEW_MAX_PIXELS = 2_000_000
+
+# Default memory budget for StageCache
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Background estimation works on a copy whose longer side is at most this
+BACKGROUND_MAX_SIDE = 512
+
+# Pixels handled at once when a whole image is passed over in bands of rows,
+# and when a background is upsampled and divided out
+BAND_PIXELS = 1 << 24
+FLATTEN_BAND_PIXELS = 1 << 18
+
+# Automatic lane finding works on a copy no larger than this
+LANE_PROJECTION_SIZE = (2000, 1000)
+MAX_AUTO_LANES = 40
+
+
+@dataclass
+class DetectionParams:
+    # Detection parameters - TLC optimized with default values
+    min_area: int = 100
+    max_area: int = 10000
+    min_circularity: float = 0.5
+    threshold_min: int = 50
+    threshold_max: int = 255
+    # Dark spots on a light plate; detection, background correction, lane
+    # finding and densitometry all follow it
+    invert_image: bool = False
+    num_lanes: int = 1
+    lane_width: int = 50
+    auto_lanes: bool = False
+    background_correction: bool = False
+    detector: str = "blob"
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, values):
+        # Ignore unknown keys so older/newer parameter files still load
+        known = {k: v for k, v in values.items() if k in cls.__dataclass_fields__}
+        return cls(**known)
+
+
+class StageCache:
+    # Thread-safe LRU cache for intermediate pipeline results, bounded by the
+    # total size of the cached arrays. Keys are tuples that start with an
+    # image key and grow with every stage, so each entry depends only on the
+    # parameters of its own and earlier stages.
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, compute):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0]
+            self.misses += 1
+
+        # Compute outside the lock so other threads are not blocked
+        value = compute()
+        size = _entry_size(value)
+        with self.lock:
+            if key not in self.entries and size <= self.max_bytes:
+                self.entries[key] = (value, size)
+                self.total_bytes += size
+                while self.total_bytes > self.max_bytes:
+                    _, (_, old_size) = self.entries.popitem(last=False)
+                    self.total_bytes -= old_size
+        return value
+
+    def discard(self, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.total_bytes -= entry[1]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+
+def _entry_size(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (list, tuple)):
+        # Keypoint tuples count 64 bytes per keypoint, arrays their real size
+        return sum(_entry_size(item) for item in value)
+    return 64
+
+
+def _cached(cache, key, compute):
+    if cache is None:
+        return compute()
+    return cache.get(key, compute)
+
+
+def image_key_for_path(file_path):
+    # Identity of an image file that changes whenever the file is rewritten
+    stat = os.stat(file_path)
+    return (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+
+
+def image_fingerprint(img):
+    # Identity for in-memory images: shape, dtype and a hash of every pixel,
+    # so edits anywhere in the image give a new key (a full pass, about
+    # 0.2 s for a 48 MP plate; callers that know the source pass image_key)
+    pixels = np.ascontiguousarray(img)
+    digest = hashlib.blake2b(pixels.data, digest_size=16).hexdigest()
+    return (img.shape, str(img.dtype), digest)
+
+
+def load_image(file_path, cache=None):
+    # Returns None if OpenCV cannot decode the file
+    if cache is None:
+        with span("load"):
+            return cv2.imread(file_path)
+    try:
+        key = (image_key_for_path(file_path), "image")
+    except OSError:
+        return None
+    with span("load"):
+        img = cache.get(key, lambda: cv2.imread(file_path))
+    if img is None:
+        # Do not remember failed loads
+        cache.discard(key)
+    return img
+
+
+def grayscale(img, cache=None, image_key=None):
+    return _cached(cache, (image_key, "gray"), lambda: cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+
+
+def estimate_background(small, params, scale):
+    # Illumination background of a downscaled grayscale copy (scale is its
+    # size relative to the original), from a morphological filter larger than
+    # any allowed spot: closing removes dark spots, opening bright ones
+    spot_diameter = 2 * np.sqrt(params.max_area / np.pi)
+    size = max(3, int(2 * spot_diameter * scale) | 1)
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (size, size))
+    op = cv2.MORPH_CLOSE if params.invert_image else cv2.MORPH_OPEN
+    background = cv2.morphologyEx(small, op, kernel, borderType=cv2.BORDER_REPLICATE)
+    return cv2.blur(background, (size, size))
+
+
+def row_bands(height, width, rows_multiple=1):
+    # (y0, y1) bands of whole rows, about BAND_PIXELS each
+    rows = max(1, BAND_PIXELS // width // rows_multiple) * rows_multiple
+    for y0 in range(0, height, rows):
+        yield y0, min(y0 + rows, height)
+
+
+class Background:
+    # Illumination background of a whole image, estimated on a copy shrunk
+    # by a whole factor and upsampled bilinearly for any region on demand.
+    # Whole images and the tiles of a scan go through this one class, so a
+    # tile is flattened exactly like the same pixels of the whole image.
+    def __init__(self, height, width, read_gray, params):
+        # read_gray(y0, y1) returns grayscale rows y0..y1 of the image; the
+        # copy is shrunk one band of rows at a time
+        self.factor = max(1, -(-max(height, width) // BACKGROUND_MAX_SIDE))
+        small_width = -(-width // self.factor)
+        parts = [cv2.resize(read_gray(y0, y1), (small_width, -(-(y1 - y0) // self.factor)),
+                            interpolation=cv2.INTER_AREA)
+                 for y0, y1 in row_bands(height, width, self.factor)]
+        background = estimate_background(np.vstack(parts), params, 1.0 / self.factor)
+        self.small = np.maximum(background, 1).astype(np.float32)
+        self.level = float(self.small.mean())
+
+    @classmethod
+    def of(cls, gray, params):
+        height, width = gray.shape[:2]
+        return cls(height, width, lambda y0, y1: gray[y0:y1], params)
+
+    def axis(self, start, stop, size):
+        # Bilinear source positions of pixel centers start..stop-1
+        positions = np.clip((np.arange(start, stop) + 0.5) / self.factor - 0.5, 0, size - 1)
+        first = np.floor(positions).astype(np.int64)
+        weight = (positions - first).astype(np.float32)
+        return first, np.minimum(first + 1, size - 1), weight
+
+    def crop(self, y0, y1, x0, x1):
+        # 8-bit background over rows y0..y1 and columns x0..x1 of the image;
+        # columns are interpolated on the few small rows needed, then rows
+        top, bottom, wy = self.axis(y0, y1, self.small.shape[0])
+        left, right, wx = self.axis(x0, x1, self.small.shape[1])
+        first, last = int(top[0]), int(bottom[-1]) + 1
+        small = self.small[first:last]
+        columns = small[:, left] * (1 - wx) + small[:, right] * wx
+        steps = np.diff(columns, axis=0, append=columns[-1:])
+        background = columns[top - first]
+        rise = steps[top - first]
+        rise *= wy[:, None]
+        background += rise
+        return np.rint(background, out=background).astype(np.uint8)
+
+    def flatten(self, gray, y0=0, x0=0):
+        # Divide out the background under gray, which covers the image from
+        # row y0 and column x0, a few rows at a time to stay in cache
+        height, width = gray.shape[:2]
+        rows = max(1, FLATTEN_BAND_PIXELS // width)
+        flat = np.empty_like(gray)
+        for r0 in range(0, height, rows):
+            r1 = min(r0 + rows, height)
+            flat[r0:r1] = cv2.divide(gray[r0:r1], self.crop(y0 + r0, y0 + r1, x0, x0 + width),
+                                     scale=self.level)
+        return flat
+
+
+def flatten_background(gray, params, background=None):
+    # Divide out uneven illumination. The background is estimated on a small
+    # copy and upsampled, so the cost is a few cheap full-resolution passes.
+    # background=(Background, y0, x0) treats gray as the region at row y0,
+    # column x0 of the image the background was estimated on, e.g. a tile.
+    if background is None:
+        background = (Background.of(gray, params), 0, 0)
+    background, y0, x0 = background
+    return background.flatten(gray, y0, x0)
+
+
+def preprocess_stages(img, params, cache=None, image_key=None, background=None):
+    # Returns the detection image and the cache key of the last stage that
+    # produced it: grayscale -> flattened -> thresholded -> inverted.
+    # background is passed on to flatten_background.
+    key = (image_key, "gray")
+    with span("grayscale"):
+        gray = grayscale(img, cache, image_key)
+
+    # Optional illumination correction before thresholding
+    if params.background_correction:
+        key = key + ("flatten", params.max_area, params.invert_image)
+        with span("flatten"):
+            gray = _cached(cache, key, lambda src=gray: flatten_background(src, params, background))
+
+    # Apply threshold if specified
+    if params.threshold_min < params.threshold_max:
+        key = key + ("threshold", params.threshold_min, params.threshold_max)
+        with span("threshold"):
+            gray = _cached(cache, key, lambda src=gray: cv2.threshold(
+                src, params.threshold_min, params.threshold_max, cv2.THRESH_BINARY)[1])
+
+    # Invert if needed for detection (regardless of display setting)
+    if params.invert_image:
+        key = key + ("invert",)
+        with span("threshold"):
+            gray = _cached(cache, key, lambda src=gray: cv2.bitwise_not(src))
+    return gray, key
+
+
+def preprocess(img, params, background=None):
+    return preprocess_stages(img, params, background=background)[0]
+
+
+def find_keypoints(detection_gray, params):
+    # Reference backend: OpenCV's blob detector, which sweeps many thresholds
+    # Set up the blob detector with TLC-specific parameters
+    blob_params = cv2.SimpleBlobDetector_Params()
+
+    # Filter by area
+    blob_params.filterByArea = True
+    blob_params.minArea = params.min_area
+    blob_params.maxArea = params.max_area
+
+    # Filter by circularity - TLC spots may be less circular
+    blob_params.filterByCircularity = True
+    blob_params.minCircularity = params.min_circularity
+
+    # Filter by color: spots are bright in the detection image, as dark
+    # spots were already inverted by preprocessing
+    blob_params.filterByColor = True
+    blob_params.blobColor = 255
+
+    detector = cv2.SimpleBlobDetector_create(blob_params)
+    return detector.detect(detection_gray)
+
+
+def find_contour_keypoints(detection_gray, params, level=None):
+    # Fast backend: one binarization and one contour pass with the same area
+    # and circularity filters as the blob detector. Returns the keypoints and
+    # the true contour areas; keypoint sizes are equivalent-circle diameters.
+    # The binarization level is Otsu's unless given (tiles of a scan share
+    # one); thresholded images are already two-level, Otsu just splits them.
+    if level is None:
+        _, mask = cv2.threshold(detection_gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    else:
+        _, mask = cv2.threshold(detection_gray, level, 255, cv2.THRESH_BINARY)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+
+    keypoints = []
+    areas = []
+    for contour in contours:
+        moments = cv2.moments(contour)
+        area = moments["m00"]
+        if area < params.min_area or area >= params.max_area:
+            continue
+        perimeter = cv2.arcLength(contour, True)
+        if perimeter == 0 or 4 * np.pi * area / (perimeter * perimeter) < params.min_circularity:
+            continue
+        keypoints.append(cv2.KeyPoint(moments["m10"] / area, moments["m01"] / area,
+                                      2 * np.sqrt(area / np.pi)))
+        areas.append(area)
+    return keypoints, np.array(areas, dtype=np.float64)
+
+
+# Spot detector backends selectable with DetectionParams.detector. Each one
+# takes the detection image and returns (keypoints, areas), where areas is
+# None when the backend only knows the keypoint diameters.
+DETECTORS = {
+    "blob": lambda detection_gray, params: (find_keypoints(detection_gray, params), None),
+    "contours": find_contour_keypoints,
+}
+
+
+def run_detector(detection_gray, params):
+    try:
+        backend = DETECTORS[params.detector]
+    except KeyError:
+        raise ValueError(f"unknown detector {params.detector!r}, "
+                         f"expected one of {', '.join(DETECTORS)}") from None
+    return backend(detection_gray, params)
+
+
+def keypoint_arrays(keypoints):
+    # Gather keypoint centers and diameters into NumPy arrays
+    pts = np.array([kp.pt for kp in keypoints], dtype=np.float64).reshape(-1, 2)
+    sizes = np.array([kp.size for kp in keypoints], dtype=np.float64)
+    return pts, sizes
+
+
+def disk_pixels(xs, ys, radii, shape):
+    # Pixel coordinates covered by every spot disk, flattened with the index
+    # of the owning spot; overlapping disks each keep their own pixels
+    height, width = shape[:2]
+    sides = 2 * radii + 1
+    box = sides * sides
+    owner = np.repeat(np.arange(len(xs)), box)
+    local = np.arange(box.sum()) - np.repeat(np.cumsum(box) - box, box)
+
+    side = sides[owner]
+    r = radii[owner]
+    dy = local // side - r
+    dx = local % side - r
+    px = xs[owner] + dx
+    py = ys[owner] + dy
+
+    keep = ((dx * dx + dy * dy <= r * r) &
+            (px >= 0) & (py >= 0) & (px < width) & (py < height))
+    return owner[keep], py[keep], px[keep]
+
+
+def region_stats(img, xs, ys, radii):
+    # Mean hue/saturation/value, median saturation and integrated saturation
+    # over each spot disk, using bincount reductions over all spots at once
+    n = len(xs)
+    stats = {
+        "hue": np.zeros(n), "saturation": np.zeros(n), "value": np.zeros(n),
+        "median_saturation": np.zeros(n), "integrated": np.zeros(n),
+    }
+    if n == 0:
+        return stats
+
+    # Process spots in chunks so large disks cannot blow up the index arrays
+    cum = np.cumsum((2 * radii + 1) ** 2)
+    start = 0
+    while start < n:
+        base = cum[start - 1] if start else 0
+        end = max(start + 1, int(np.searchsorted(cum, base + REGION_CHUNK_PIXELS, side="right")))
+        sl = slice(start, end)
+        m = end - start
+
+        owner, py, px = disk_pixels(xs[sl], ys[sl], radii[sl], img.shape)
+        hsv = cv2.cvtColor(img[py, px].reshape(-1, 1, 3), cv2.COLOR_BGR2HSV).reshape(-1, 3)
+        hue = hsv[:, 0].astype(np.float64)
+        sat = hsv[:, 1].astype(np.float64)
+        val = hsv[:, 2].astype(np.float64)
+
+        counts = np.bincount(owner, minlength=m)
+        sat_sum = np.bincount(owner, weights=sat, minlength=m)
+        stats["saturation"][sl] = sat_sum / counts
+        stats["value"][sl] = np.bincount(owner, weights=val, minlength=m) / counts
+        stats["integrated"][sl] = sat_sum
+
+        # OpenCV hue is an angle on 0-179, so average it on the circle
+        angle = hue * (np.pi / 90.0)
+        mean_angle = np.arctan2(np.bincount(owner, weights=np.sin(angle), minlength=m),
+                                np.bincount(owner, weights=np.cos(angle), minlength=m))
+        stats["hue"][sl] = np.mod(mean_angle * (90.0 / np.pi), 180.0)
+
+        # Median: sort by (spot, saturation) and pick the middle of each run
+        order = np.lexsort((sat, owner))
+        sorted_sat = sat[order]
+        first = np.cumsum(counts) - counts
+        lower = sorted_sat[first + (counts - 1) // 2]
+        upper = sorted_sat[first + counts // 2]
+        stats["median_saturation"][sl] = (lower + upper) / 2.0
+
+        start = end
+    return stats
+
+
+def rf_values(ys, height):
+    # For TLC: y-position relative to total height (approximate Rf value)
+    return np.round(1.0 - ys / height, 3)
+
+
+def lane_numbers(xs, width, num_lanes):
+    # Determine lane number based on x-position (if multiple lanes)
+    if num_lanes > 1:
+        return (xs / (width / num_lanes)).astype(SPOT_DTYPES["Lane"]) + 1
+    return np.ones(len(xs), dtype=SPOT_DTYPES["Lane"])
+
+
+def extract_spot_features(img, keypoints, params, areas=None):
+    # areas are the measured spot areas from the detector, if it has them;
+    # otherwise the area of the keypoint circle is reported
+    pts, sizes = keypoint_arrays(keypoints)
+    if areas is None:
+        areas = np.pi * (sizes / 2) ** 2
+    height, width = img.shape[:2]
+
+    xs = pts[:, 0].astype(np.int64)
+    ys = pts[:, 1].astype(np.int64)
+    spot_nums = np.arange(1, len(xs) + 1)
+
+    # Handle boundary conditions
+    inside = (xs >= 0) & (ys >= 0) & (xs < width) & (ys < height)
+    xs, ys, sizes, spot_nums = xs[inside], ys[inside], sizes[inside], spot_nums[inside]
+    areas = np.asarray(areas, dtype=np.float64)[inside]
+
+    # Extract color and saturation info over the whole spot disk - key for TLC analysis
+    stats = region_stats(img, xs, ys, (sizes / 2).astype(np.int64))
+
+    return spot_table({
+        "Spot #": spot_nums,
+        "Lane": lane_numbers(xs, width, params.num_lanes),
+        "Rf": rf_values(ys, height),
+        "X": xs,
+        "Y": ys,
+        "Area": np.round(areas, 2),
+        "Saturation": np.round(stats["saturation"], 1),
+        "Hue": np.round(stats["hue"], 1),
+        "Value": np.round(stats["value"], 1),
+        "Median Saturation": np.round(stats["median_saturation"], 1),
+        "Integrated Intensity": np.round(stats["integrated"], 0),
+        "Rel Conc": np.round(stats["saturation"] / 255.0, 3)  # Simplified relative concentration
+    })
+
+
+def spot_table(columns=None):
+    # Spot table with the SPOT_DTYPES column types from a dict of arrays;
+    # without arguments an empty table
+    import pandas as pd
+    columns = columns or {}
+    return pd.DataFrame({name: np.asarray(columns.get(name, ()), dtype=dtype)
+                         for name, dtype in SPOT_DTYPES.items()}, columns=SPOT_COLUMNS)
+
+
+def make_preview(img, max_pixels=PREVIEW_MAX_PIXELS):
+    # Downscaled copy for interactive tuning; returns None when the image is
+    # already small enough to detect on directly
+    scale = (max_pixels / (img.shape[0] * img.shape[1])) ** 0.5
+    if scale >= 1.0:
+        return None
+    preview_img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    # Use the exact ratio after rounding to whole pixels
+    return preview_img, preview_img.shape[1] / img.shape[1]
+
+
+def scale_params(params, scale):
+    # Area limits shrink with the square of the linear scale
+    return replace(params,
+                   min_area=params.min_area * scale * scale,
+                   max_area=params.max_area * scale * scale)
+
+
+def cached_keypoints(img, params, cache=None, image_key=None):
+    # Keypoint stage on top of the preprocessing stages; changing only the
+    # area or circularity filters reuses the cached detection image.
+    # Returns (keypoints, areas) as from run_detector.
+    detection_gray, key = preprocess_stages(img, params, cache, image_key)
+    key = key + ("keypoints", params.detector, params.min_area, params.max_area,
+                 params.min_circularity, params.invert_image)
+
+    def compute():
+        keypoints, areas = run_detector(detection_gray, params)
+        return tuple(keypoints), areas
+    with span("detect"):
+        return _cached(cache, key, compute)
+
+
+def find_preview_keypoints(preview, params, cache=None, image_key=None):
+    # Detect on the downscaled image and map keypoints (and areas) back to
+    # original pixels
+    preview_img, scale = preview
+    small_params = scale_params(params, scale)
+    keypoints, areas = cached_keypoints(preview_img, small_params, cache,
+                                        (image_key, "preview", scale))
+    keypoints = [cv2.KeyPoint((kp.pt[0] + 0.5) / scale - 0.5, (kp.pt[1] + 0.5) / scale - 0.5,
+                              kp.size / scale)
+                 for kp in keypoints]
+    if areas is not None:
+        areas = areas / (scale * scale)
+    return keypoints, areas
+
+
+def detect_spots(img, params, preview=None, cache=None, image_key=None):
+    # Full detection pipeline: returns the raw keypoints and the spot table.
+    # With a preview from make_preview the detector runs on the small image,
+    # while features, Rf, X and Y are still measured on the full image.
+    # Passing a StageCache memoizes every stage; image_key defaults to a
+    # fingerprint of the image.
+    if cache is not None and image_key is None:
+        image_key = image_fingerprint(img)
+    if preview is not None:
+        keypoints, areas = find_preview_keypoints(preview, params, cache, image_key)
+    else:
+        keypoints, areas = cached_keypoints(img, params, cache, image_key)
+        keypoints = list(keypoints)
+    with span("features"):
+        blob_data = extract_spot_features(img, keypoints, params, areas)
+    return keypoints, blob_data
+
+
+def draw_spots(img, keypoints, scale=1.0):
+    # Draw detected spots with labels on a copy of the image; scale maps
+    # original-image keypoints onto a resized display image
+    img_with_labels = img.copy()
+    for idx, keypoint in enumerate(keypoints):
+        x_center, y_center = int(keypoint.pt[0] * scale), int(keypoint.pt[1] * scale)
+
+        if y_center >= img.shape[0] or x_center >= img.shape[1]:
+            continue
+
+        radius = int(keypoint.size * scale / 2)
+        cv2.circle(img_with_labels, (x_center, y_center), radius, (0, 255, 0), 2)
+
+        # Draw label above the spot
+        label = f"Spot {idx+1}"
+        cv2.putText(img_with_labels, label, (x_center, y_center-10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+    return img_with_labels
+
+
+@dataclass
+class LaneModel:
+    # Lane centers and the boundaries between them, in original-image x
+    # pixels; edges has one more entry than centers
+    centers: np.ndarray
+    edges: np.ndarray
+
+    @classmethod
+    def uniform(cls, img_width, num_lanes):
+        # Equal-width lanes, the way the "Number of Lanes" slider splits the plate
+        lane_width = img_width // num_lanes
+        edges = np.arange(num_lanes + 1, dtype=np.float64) * lane_width
+        edges[-1] = img_width
+        centers = np.arange(num_lanes) * lane_width + lane_width // 2
+        return cls(centers.astype(np.float64), edges)
+
+    def __len__(self):
+        return len(self.centers)
+
+    def assign(self, xs):
+        # Lane number (1-based) of each x position
+        return np.searchsorted(self.edges[1:-1], np.asarray(xs), side="right") + 1
+
+    def band_width(self):
+        return float(np.diff(self.edges).min())
+
+
+def remove_rolling_minimum(projection, window):
+    # Subtract a rolling minimum (an opening) about `window` samples wide,
+    # leaving peaks narrower than the window on a flat floor
+    kernel = np.ones((1, max(3, int(window) | 1)), dtype=np.uint8)
+    signal = projection.astype(np.float32)[None, :]
+    floor = cv2.dilate(cv2.erode(signal, kernel, borderType=cv2.BORDER_REPLICATE),
+                       kernel, borderType=cv2.BORDER_REPLICATE)
+    return (signal - floor)[0]
+
+
+def lane_pitches(projection, min_pitch):
+    # Candidate lane pitches: side peaks of the projection's autocorrelation,
+    # smallest first. Only peaks at least half as strong as the strongest
+    # are kept, so a multiple of the pitch (lanes two apart also line up)
+    # comes after the pitch itself.
+    n = len(projection)
+    if n < 4:
+        return []
+    signal = projection.astype(np.float64) - projection.mean()
+    correlation = np.correlate(signal, signal, mode="full")[n - 1:]
+    if correlation[0] <= 0:
+        return []
+    correlation = correlation / correlation[0]
+    lags = np.arange(max(1, min_pitch), n * 3 // 4)
+    lags = lags[(correlation[lags] >= correlation[lags - 1])
+                & (correlation[lags] > correlation[lags + 1])
+                & (correlation[lags] > 0.1)]
+    if len(lags) == 0:
+        return []
+    return [int(lag) for lag in lags[correlation[lags] >= 0.5 * correlation[lags].max()]]
+
+
+def lane_peaks(projection, pitch, margin):
+    # Lane positions for one candidate pitch: maxima at least 0.6 pitches
+    # apart that rise a fifth of the way to the strongest one above a rolling
+    # minimum one pitch wide. Lanes are never spotted within `margin` of the
+    # plate edge.
+    projection = remove_rolling_minimum(projection, pitch)
+    window = np.ones((1, 2 * int(0.6 * pitch) + 1), dtype=np.uint8)
+    local_max = cv2.dilate(projection[None, :], window, borderType=cv2.BORDER_REPLICATE)[0]
+    is_peak = (projection >= local_max) & (projection > 0.2 * projection.max())
+    is_peak[1:] &= projection[1:] > projection[:-1]
+    is_peak[:margin] = False
+    is_peak[len(is_peak) - margin:] = False
+    return np.flatnonzero(is_peak)
+
+
+def find_lanes(gray, params, max_lanes=MAX_AUTO_LANES):
+    # Locate lanes from the column-wise intensity projection of the plate.
+    # Works on a downscaled copy; falls back to uniform lanes unless the
+    # peaks found repeat at the pitch the projection itself shows.
+    height, width = gray.shape[:2]
+    small_width = min(width, LANE_PROJECTION_SIZE[0])
+    small_height = min(height, LANE_PROJECTION_SIZE[1])
+    small = cv2.resize(gray, (small_width, small_height), interpolation=cv2.INTER_AREA)
+    x_scale = width / small_width
+    uniform = LaneModel.uniform(width, max(1, params.num_lanes))
+
+    # Spot signal above the illumination background, with the polarity
+    # detection uses. Each column's median (plate, not spots, in almost all
+    # rows) is removed so the background estimate's bias does not add up
+    # over the rows into false lanes.
+    signal = small.astype(np.float32) - estimate_background(small, params, 1.0 / x_scale)
+    if params.invert_image:
+        signal = -signal
+    signal -= np.median(signal, axis=0)
+    projection = np.clip(signal, 0, None).mean(axis=0)
+
+    # Smooth over the smallest spot and drop anything wider than a quarter
+    # of the plate
+    radius = max(2, int(np.sqrt(params.min_area / np.pi) / x_scale))
+    projection = cv2.blur(projection[None, :], (2 * radius + 1, 1),
+                          borderType=cv2.BORDER_REPLICATE)[0]
+    projection = remove_rolling_minimum(projection, small_width // 4)
+    if projection.max() <= 0:
+        return uniform
+
+    # Accept the first pitch whose peaks are evenly spaced at that pitch and
+    # spread over at least half the plate; closer peaks are more likely the
+    # scattered spots of one lane
+    for pitch in lane_pitches(projection, 2 * radius):
+        peaks = lane_peaks(projection, pitch, radius)
+        if not 2 <= len(peaks) <= max_lanes:
+            continue
+        if np.any(np.abs(np.diff(peaks) / pitch - 1) > 0.25):
+            continue
+        if len(peaks) * pitch < small_width / 2:
+            continue
+        centers = (peaks + 0.5) * x_scale
+        edges = np.concatenate([[0.0], (centers[:-1] + centers[1:]) / 2, [float(width)]])
+        return LaneModel(centers, edges)
+    return uniform
+
+
+def lane_model_for(img, params, cache=None, image_key=None):
+    # The lane model the current parameters ask for
+    with span("lanes"):
+        if params.auto_lanes:
+            return find_lanes(grayscale(img, cache, image_key), params)
+        return LaneModel.uniform(img.shape[1], params.num_lanes)
+
+
+def analyze_lanes(blob_data, img_width, num_lanes, lane_model=None):
+    # Re-bucket spots into lanes (equal-width unless a lane model is given);
+    # returns the updated table and one sub-table per lane
+    if lane_model is None:
+        lane_model = LaneModel.uniform(img_width, num_lanes)
+    with span("lanes"):
+        blob_data = blob_data.copy()
+        if len(blob_data) > 0:
+            blob_data["Lane"] = lane_model.assign(blob_data["X"].to_numpy()).astype(
+                SPOT_DTYPES["Lane"])
+
+        lanes = [blob_data[blob_data["Lane"] == i] for i in range(1, len(lane_model) + 1)]
+    return blob_data, lanes
+
+
+def draw_lanes(img, lane_model, scale=1.0):
+    # scale maps original-image lane positions onto img when drawing on a
+    # resized copy
+    lane_img = img.copy()
+
+    # Draw lane separators
+    for edge in lane_model.edges[1:-1]:
+        x_pos = int(edge * scale)
+        cv2.line(lane_img, (x_pos, 0), (x_pos, img.shape[0]), (0, 0, 255), 2)
+
+    # Display lane numbers
+    for i, center in enumerate(lane_model.centers):
+        x_pos = int(center * scale)
+        cv2.putText(lane_img, f"Lane {i+1}", (x_pos-30, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 0), 2)
+    return lane_img
+
+
+def analyze_image(img, params):
+    # detect_spots + analyze_lanes in one call, for batch and worker use
+    keypoints, blob_data = detect_spots(img, params)
+    lanes = []
+    if (params.num_lanes > 1 or params.auto_lanes) and len(blob_data) > 0:
+        lane_model = lane_model_for(img, params)
+        blob_data, lanes = analyze_lanes(blob_data, img.shape[1], len(lane_model), lane_model)
+    return keypoints, blob_data, lanes
@@ -0,0 +1,132 @@
+"""Streaming writers for spot and peak tables.
+
+The format follows the file extension: .csv is written in chunks of rows,
+.parquet as Parquet and .arrow/.feather as an Arrow IPC file. Tables are
+written as they arrive, one plate at a time, so a batch never holds more
+than a plate (plus one buffered row group for the columnar formats) in
+memory. Parquet and Arrow need the optional pyarrow package.
+
+    writer = tlc_export.open_writer("spots.parquet")
+    for blob_data in tables:
+        writer.write(blob_data)
+    writer.close()
+"""
+import os
+
+# Rows formatted at once when writing CSV
+CSV_CHUNK_ROWS = 50_000
+
+# Rows collected before a Parquet row group / Arrow record batch is written
+ROW_GROUP_ROWS = 65_536
+
+FORMATS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+}
+
+
+def output_format(file_path):
+    # Unknown extensions are written as CSV, as before
+    return FORMATS.get(os.path.splitext(file_path)[1].lower(), "csv")
+
+
+def _pyarrow(file_path):
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise ImportError(f"writing {file_path} needs the pyarrow package "
+                          "(pip install pyarrow)") from None
+    return pyarrow
+
+
+class CsvTableWriter:
+    # append=True keeps existing rows; the header is only written to new or
+    # empty files
+    def __init__(self, file_path, append=False):
+        self.file_path = file_path
+        self.file = open(file_path, "a" if append else "w", newline="")
+        self.wrote_header = self.file.tell() > 0
+        self.rows = 0
+
+    def write(self, table):
+        table.to_csv(self.file, header=not self.wrote_header, index=False,
+                     chunksize=CSV_CHUNK_ROWS)
+        self.file.flush()
+        self.wrote_header = True
+        self.rows += len(table)
+
+    def close(self):
+        self.file.close()
+
+
+class ArrowTableWriter:
+    # Parquet or Arrow IPC file. The schema is taken from the first table
+    # (columns that are still empty there are text); later tables are cast
+    # to it. Small per-plate tables are collected into row groups of about
+    # ROW_GROUP_ROWS rows. Columnar files cannot be appended to, so
+    # append=True only works while the file does not exist yet.
+    def __init__(self, file_path, kind, append=False):
+        self.pa = _pyarrow(file_path)
+        if append and os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+            raise ValueError(f"{file_path}: only CSV output can be appended to")
+        self.file_path = file_path
+        self.kind = kind
+        self.schema = None
+        self.writer = None
+        self.pending = []
+        self.pending_rows = 0
+        self.rows = 0
+
+    def write(self, table):
+        pa = self.pa
+        data = pa.Table.from_pandas(table, preserve_index=False)
+        if self.schema is None:
+            self.schema = pa.schema([pa.field(field.name, pa.string())
+                                     if pa.types.is_null(field.type) else field
+                                     for field in data.schema])
+        self.pending.append(data.replace_schema_metadata(None).cast(self.schema))
+        self.pending_rows += len(table)
+        self.rows += len(table)
+        if self.pending_rows >= ROW_GROUP_ROWS:
+            self.flush()
+
+    def flush(self):
+        if self.schema is None:
+            return
+        if self.writer is None:
+            if self.kind == "parquet":
+                self.writer = self.pa.parquet.ParquetWriter(self.file_path, self.schema)
+            else:
+                self.writer = self.pa.ipc.new_file(self.file_path, self.schema)
+        if self.pending:
+            self.writer.write_table(self.pa.concat_tables(self.pending))
+        self.pending = []
+        self.pending_rows = 0
+
+    def close(self):
+        # A batch without any table writes no file
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+
+
+def open_writer(file_path, append=False):
+    kind = output_format(file_path)
+    if kind == "csv":
+        return CsvTableWriter(file_path, append)
+    return ArrowTableWriter(file_path, kind, append)
+
+
+def write_table(file_path, table):
+    # One table in the format of the file extension
+    writer = open_writer(file_path)
+    try:
+        writer.write(table)
+    finally:
+        writer.close()
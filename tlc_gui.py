@@ -0,0 +1,1153 @@
+"""Tkinter front end of the TLC analyzer.
+
+Started by OTLC.py when no images are given on the command line. Only
+what the first window needs is imported up front: matplotlib, pandas,
+densitometry, calibration and the results store are loaded on first
+use, and the Analysis and Calibration tabs are built the first time
+they are opened.
+"""
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from tkinter import Tk, filedialog, Canvas, Frame, Scrollbar
+from tkinter import ttk, IntVar, StringVar, DoubleVar
+
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+import tlc_engine
+import tlc_library
+import tlc_profile
+from tlc_engine import DetectionParams
+
+# Slider releases closer together than this only trigger one detection
+DEBOUNCE_MS = 150
+# How often the Tk loop checks for finished background work
+POLL_MS = 30
+# Canvas resizes are coalesced and redrawn once they settle for this long
+RESIZE_MS = 100
+LANE_COLORS = ['blue', 'red', 'green', 'orange', 'purple', 'brown', 'pink', 'gray', 'olive', 'cyan']
+# Spot table rows shown before the widget has been laid out
+PAGE_ROWS = 25
+
+class SpotTable:
+    # Spot table for plates with thousands of spots. The Treeview only holds
+    # as many rows as fit on screen; these are fixed slots whose values are
+    # rewritten as the view scrolls, and a slot is only touched when its text
+    # changes. Sorting (click a heading) and filtering (by lane, Rf range and
+    # minimum area) reorder an index into the data instead of the widget.
+    def __init__(self, master, columns):
+        self.columns = columns
+        self.frame = Frame(master)
+        self.frame.columnconfigure(0, weight=1)
+        self.frame.rowconfigure(1, weight=1)
+        
+        # Filter bar; filters apply on Enter, on leaving a field or on lane selection
+        filter_frame = Frame(self.frame)
+        filter_frame.grid(row=0, column=0, columnspan=2, sticky="ew")
+        self.lane_filter = StringVar(value="All")
+        self.rf_min = StringVar()
+        self.rf_max = StringVar()
+        self.min_area = StringVar()
+        ttk.Label(filter_frame, text="Lane:").grid(row=0, column=0, padx=2, sticky="w")
+        self.lane_combo = ttk.Combobox(filter_frame, textvariable=self.lane_filter, state="readonly",
+                                       values=["All"], width=5)
+        self.lane_combo.grid(row=0, column=1, padx=2, sticky="w")
+        self.lane_combo.bind("<<ComboboxSelected>>", lambda e: self.apply_filters())
+        ttk.Label(filter_frame, text="Rf:").grid(row=0, column=2, padx=2, sticky="w")
+        ttk.Label(filter_frame, text="to").grid(row=0, column=4, padx=2, sticky="w")
+        ttk.Label(filter_frame, text="Min Area:").grid(row=0, column=6, padx=2, sticky="w")
+        for column, variable in [(3, self.rf_min), (5, self.rf_max), (7, self.min_area)]:
+            entry = ttk.Entry(filter_frame, textvariable=variable, width=6)
+            entry.grid(row=0, column=column, padx=2, sticky="w")
+            entry.bind("<Return>", lambda e: self.apply_filters())
+            entry.bind("<FocusOut>", lambda e: self.apply_filters())
+        self.count_text = ttk.Label(filter_frame, text="")
+        self.count_text.grid(row=0, column=8, padx=5, sticky="w")
+        
+        # The scrollbar drives the window into the data, not the Treeview
+        self.tree = ttk.Treeview(self.frame, columns=columns, show="headings", height=PAGE_ROWS)
+        self.tree.grid(row=1, column=0, sticky="nsew")
+        self.y_scroll = ttk.Scrollbar(self.frame, orient="vertical", command=self.yview)
+        self.y_scroll.grid(row=1, column=1, sticky="ns")
+        self.x_scroll = ttk.Scrollbar(self.frame, orient="horizontal", command=self.tree.xview)
+        self.x_scroll.grid(row=2, column=0, sticky="ew")
+        self.tree.configure(xscrollcommand=self.x_scroll.set)
+        for col in columns:
+            self.tree.heading(col, text=col, command=partial(self.sort_by, col))
+            self.tree.column(col, width=80, anchor="center")
+        self.tree.bind("<Configure>", lambda e: self.fit_slots())
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll_wheel(-1 if e.delta > 0 else 1))
+        self.tree.bind("<Button-4>", lambda e: self.scroll_wheel(-1))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_wheel(1))
+        
+        self.arrays = {col: np.empty(0) for col in columns}
+        self.num_rows = 0
+        self.view = np.empty(0, dtype=np.intp)
+        self.top = 0
+        self.sort_column = None
+        self.sort_descending = False
+        self.slots = []
+        self.shown = []
+        self.set_slot_count(PAGE_ROWS)
+    
+    def set_data(self, blob_data):
+        # Show a new spot table, keeping the sort, filters and scroll position
+        self.num_rows = 0 if blob_data is None else len(blob_data)
+        for col in self.columns:
+            if blob_data is not None and col in blob_data:
+                values = blob_data[col].to_numpy()
+                self.arrays[col] = values.astype(np.int64) if col == "Area" else values
+            else:
+                self.arrays[col] = np.full(self.num_rows, "", dtype=object)
+        lanes = np.unique(self.arrays["Lane"]) if self.num_rows else []
+        self.lane_combo.configure(values=["All"] + [str(lane) for lane in lanes])
+        self.update_view()
+        # Rows can only be measured once Tk has laid them out
+        self.tree.after_idle(self.fit_slots)
+    
+    def filter_mask(self):
+        # Rows passing the filters; unparsable entries count as no filter
+        mask = np.ones(self.num_rows, dtype=bool)
+        lane = self.lane_filter.get()
+        if lane != "All":
+            mask &= self.arrays["Lane"].astype(str) == lane
+        for col, variable, keep in [("Rf", self.rf_min, np.greater_equal),
+                                    ("Rf", self.rf_max, np.less_equal),
+                                    ("Area", self.min_area, np.greater_equal)]:
+            try:
+                limit = float(variable.get())
+            except ValueError:
+                continue
+            mask &= keep(self.arrays[col].astype(np.float64), limit)
+        return mask
+    
+    def update_view(self):
+        view = np.flatnonzero(self.filter_mask())
+        if self.sort_column is not None:
+            keys = self.arrays[self.sort_column][view]
+            if keys.dtype == object:
+                keys = keys.astype(str)
+            order = np.argsort(keys, kind="stable")
+            view = view[order[::-1] if self.sort_descending else order]
+        self.view = view
+        self.count_text.config(text=f"{len(view)} of {self.num_rows} spots")
+        self.scroll_to(self.top)
+    
+    def apply_filters(self):
+        self.top = 0
+        self.update_view()
+    
+    def sort_by(self, col):
+        # First click sorts ascending, the next one descending
+        if self.sort_column == col:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_column, self.sort_descending = col, False
+        for name in self.columns:
+            arrow = (" \u25bc" if self.sort_descending else " \u25b2") if name == col else ""
+            self.tree.heading(name, text=name + arrow)
+        self.update_view()
+    
+    def yview(self, *args):
+        # Scrollbar protocol: ("moveto", fraction) or ("scroll", n, "units"/"pages")
+        if args[0] == "moveto":
+            self.scroll_to(int(round(float(args[1]) * len(self.view))))
+        else:
+            step = int(args[1]) * (len(self.slots) if args[2] == "pages" else 1)
+            self.scroll_to(self.top + step)
+    
+    def scroll_wheel(self, direction):
+        self.scroll_to(self.top + 3 * direction)
+        return "break"
+    
+    def scroll_to(self, top):
+        count = len(self.view)
+        self.top = max(0, min(top, count - len(self.slots)))
+        if count:
+            self.y_scroll.set(self.top / count, min(1.0, (self.top + len(self.slots)) / count))
+        else:
+            self.y_scroll.set(0.0, 1.0)
+        self.refresh()
+    
+    def fit_slots(self):
+        # As many slots as the widget has room for, measured from the first row
+        box = self.tree.bbox(self.slots[0]) if self.slots and self.shown[0] is not None else ""
+        if box:
+            _, header, _, row_height = box
+            self.set_slot_count(max(1, (self.tree.winfo_height() - header) // max(1, row_height)))
+            self.scroll_to(self.top)
+    
+    def set_slot_count(self, count):
+        while len(self.slots) < count:
+            self.slots.append(self.tree.insert("", "end", values=[]))
+            self.tree.detach(self.slots[-1])
+            self.shown.append(None)
+        while len(self.slots) > count:
+            self.tree.delete(self.slots.pop())
+            self.shown.pop()
+    
+    def refresh(self):
+        # Rewrite the slots that show something else than before
+        rows = self.view[self.top:self.top + len(self.slots)]
+        columns = list(zip(*[self.arrays[col][rows].tolist() for col in self.columns]))
+        for i, slot in enumerate(self.slots):
+            values = columns[i] if i < len(columns) else None
+            if values == self.shown[i]:
+                continue
+            if values is None:
+                self.tree.detach(slot)
+            else:
+                if self.shown[i] is None:
+                    self.tree.move(slot, "", i)
+                self.tree.item(slot, values=values)
+            self.shown[i] = values
+
+class TLCAnalyzer:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("TLC Analyzer")
+        
+        # Get screen dimensions and set window size
+        screen_width = root.winfo_screenwidth()
+        screen_height = root.winfo_screenheight()
+        initial_width = int(screen_width * 0.9)
+        initial_height = int(screen_height * 0.9)
+        self.root.geometry(f"{initial_width}x{initial_height}")
+        
+        # Make the window responsive
+        self.root.columnconfigure(0, weight=1)
+        self.root.rowconfigure(0, weight=1)
+        
+        # Variables
+        self.image_path = None
+        self.img = None
+        self.display_base = None
+        self.display_scale = 1.0
+        self.display_key = None
+        self.resize_after = None
+        self.photo_image = None
+        self.keypoints = None
+        self.blob_data = None
+        self.preview = None
+        self.detection_is_preview = False
+        self.image_key = None
+        
+        # Memoized images and preprocessing stages, shared across reloads
+        self.cache = tlc_engine.StageCache()
+        self.lanes = []
+        self.lane_model = None
+        self.lane_profiles = None
+        self.lane_peaks = None
+        self.calibration = None
+        self.standards = None
+        self.plots_dirty = False
+        # Spots are only labelled with compounds once a library is chosen; the
+        # built-in Rf/hue ranges are examples, not valid for every lab
+        self.library = None
+        self.calibration_model = StringVar(value="linear")
+        
+        # Background work: one worker thread runs detection and lane analysis,
+        # results come back through a queue polled from the Tk loop. Debounce
+        # timers and queued futures are kept per job kind ("detect", "lanes").
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.results = queue.Queue()
+        self.generation = 0
+        self.detect_generation = 0
+        self.pending_after = {}
+        self.pending_futures = {}
+        self.worker_state = None
+        
+        # Detection parameters - TLC optimized with default values
+        self.min_area = IntVar(value=100)
+        self.max_area = IntVar(value=10000)
+        self.min_circularity = DoubleVar(value=0.5)
+        self.threshold_min = IntVar(value=50)
+        self.threshold_max = IntVar(value=255)
+        self.invert_image = IntVar(value=0)
+        self.num_lanes = IntVar(value=1)
+        self.lane_width = IntVar(value=50)
+        self.auto_lanes = IntVar(value=0)
+        self.background_correction = IntVar(value=0)
+        self.detector = StringVar(value="blob")
+        
+        # Create main layout
+        self.create_layout()
+        
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after(POLL_MS, self.poll_results)
+        
+        # Start with file dialog
+        self.load_image()
+    
+    def create_layout(self):
+        # Create notebook for tabs
+        self.notebook = ttk.Notebook(self.root)
+        self.notebook.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
+        
+        # Create tabs
+        self.main_tab = Frame(self.notebook)
+        self.analysis_tab = Frame(self.notebook)
+        self.calibration_tab = Frame(self.notebook)
+        
+        self.notebook.add(self.main_tab, text="TLC Image")
+        self.notebook.add(self.analysis_tab, text="Analysis")
+        self.notebook.add(self.calibration_tab, text="Calibration")
+        
+        # Configure tabs to expand
+        for tab in [self.main_tab, self.analysis_tab, self.calibration_tab]:
+            tab.columnconfigure(0, weight=1)
+            tab.rowconfigure(0, weight=1)
+        
+        # === Main Tab ===
+        main_paned = ttk.PanedWindow(self.main_tab, orient="horizontal")
+        main_paned.grid(row=0, column=0, sticky="nsew")
+        
+        # Left frame for image and controls
+        self.left_frame = Frame(main_paned)
+        self.left_frame.columnconfigure(0, weight=1)
+        self.left_frame.rowconfigure(0, weight=1)
+        
+        # Right frame for spot data
+        self.right_frame = Frame(main_paned)
+        self.right_frame.columnconfigure(0, weight=1)
+        self.right_frame.rowconfigure(1, weight=1)
+        
+        main_paned.add(self.left_frame, weight=3)
+        main_paned.add(self.right_frame, weight=2)
+        
+        # Image frame with controls below
+        image_controls_frame = Frame(self.left_frame)
+        image_controls_frame.grid(row=0, column=0, sticky="nsew")
+        image_controls_frame.columnconfigure(0, weight=1)
+        image_controls_frame.rowconfigure(0, weight=1)
+        
+        # Canvas for image
+        self.canvas_frame = Frame(image_controls_frame)
+        self.canvas_frame.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
+        self.canvas_frame.columnconfigure(0, weight=1)
+        self.canvas_frame.rowconfigure(0, weight=1)
+        
+        self.canvas = Canvas(self.canvas_frame, bg="lightgray")
+        self.canvas.grid(row=0, column=0, sticky="nsew")
+        
+        # Scrollbars for canvas
+        self.h_scrollbar = Scrollbar(self.canvas_frame, orient="horizontal", command=self.canvas.xview)
+        self.h_scrollbar.grid(row=1, column=0, sticky="ew")
+        
+        self.v_scrollbar = Scrollbar(self.canvas_frame, orient="vertical", command=self.canvas.yview)
+        self.v_scrollbar.grid(row=0, column=1, sticky="ns")
+        
+        self.canvas.configure(xscrollcommand=self.h_scrollbar.set, yscrollcommand=self.v_scrollbar.set)
+        self.canvas.bind("<Configure>", self.resize_image)
+        
+        # Control panel
+        control_frame = ttk.LabelFrame(image_controls_frame, text="Detection Controls")
+        control_frame.grid(row=1, column=0, sticky="ew", padx=5, pady=5)
+        
+        # Controls - first row
+        ttk.Label(control_frame, text="Min Area:").grid(row=0, column=0, padx=5, pady=2, sticky="w")
+        min_area_scale = ttk.Scale(control_frame, from_=10, to=1000, variable=self.min_area, orient="horizontal")
+        min_area_scale.grid(row=0, column=1, padx=5, pady=2, sticky="ew")
+        min_area_scale.bind("<ButtonRelease-1>", lambda e: self.request_detection())
+        ttk.Label(control_frame, textvariable=self.min_area).grid(row=0, column=2, padx=5, pady=2, sticky="w")
+        
+        ttk.Label(control_frame, text="Max Area:").grid(row=0, column=3, padx=5, pady=2, sticky="w")
+        max_area_scale = ttk.Scale(control_frame, from_=1000, to=50000, variable=self.max_area, orient="horizontal")
+        max_area_scale.grid(row=0, column=4, padx=5, pady=2, sticky="ew")
+        max_area_scale.bind("<ButtonRelease-1>", lambda e: self.request_detection())
+        ttk.Label(control_frame, textvariable=self.max_area).grid(row=0, column=5, padx=5, pady=2, sticky="w")
+        
+        # Controls - second row
+        ttk.Label(control_frame, text="Min Circularity:").grid(row=1, column=0, padx=5, pady=2, sticky="w")
+        circ_scale = ttk.Scale(control_frame, from_=0.1, to=1.0, variable=self.min_circularity, orient="horizontal")
+        circ_scale.grid(row=1, column=1, padx=5, pady=2, sticky="ew")
+        circ_scale.bind("<ButtonRelease-1>", lambda e: self.request_detection())
+        ttk.Label(control_frame, textvariable=self.min_circularity).grid(row=1, column=2, padx=5, pady=2, sticky="w")
+        
+        invert_check = ttk.Checkbutton(control_frame, text="Invert Image", variable=self.invert_image, 
+                                      command=self.request_detection)
+        invert_check.grid(row=1, column=3, columnspan=3, padx=5, pady=2, sticky="w")
+        
+        # Controls - third row
+        ttk.Label(control_frame, text="Threshold:").grid(row=2, column=0, padx=5, pady=2, sticky="w")
+        thresh_min_scale = ttk.Scale(control_frame, from_=0, to=255, variable=self.threshold_min, orient="horizontal")
+        thresh_min_scale.grid(row=2, column=1, padx=5, pady=2, sticky="ew")
+        thresh_min_scale.bind("<ButtonRelease-1>", lambda e: self.request_detection())
+        ttk.Label(control_frame, textvariable=self.threshold_min).grid(row=2, column=2, padx=5, pady=2, sticky="w")
+        
+        ttk.Label(control_frame, text="to").grid(row=2, column=3, padx=5, pady=2, sticky="w")
+        thresh_max_scale = ttk.Scale(control_frame, from_=0, to=255, variable=self.threshold_max, orient="horizontal")
+        thresh_max_scale.grid(row=2, column=4, padx=5, pady=2, sticky="ew")
+        thresh_max_scale.bind("<ButtonRelease-1>", lambda e: self.request_detection())
+        ttk.Label(control_frame, textvariable=self.threshold_max).grid(row=2, column=5, padx=5, pady=2, sticky="w")
+        
+        # Controls - fourth row (Lane Analysis)
+        ttk.Label(control_frame, text="Number of Lanes:").grid(row=3, column=0, padx=5, pady=2, sticky="w")
+        lanes_scale = ttk.Scale(control_frame, from_=1, to=10, variable=self.num_lanes, orient="horizontal")
+        lanes_scale.grid(row=3, column=1, padx=5, pady=2, sticky="ew")
+        lanes_scale.bind("<ButtonRelease-1>", lambda e: self.request_lane_analysis())
+        ttk.Label(control_frame, textvariable=self.num_lanes).grid(row=3, column=2, padx=5, pady=2, sticky="w")
+        
+        ttk.Label(control_frame, text="Lane Width:").grid(row=3, column=3, padx=5, pady=2, sticky="w")
+        lane_width_scale = ttk.Scale(control_frame, from_=10, to=100, variable=self.lane_width, orient="horizontal")
+        lane_width_scale.grid(row=3, column=4, padx=5, pady=2, sticky="ew")
+        lane_width_scale.bind("<ButtonRelease-1>", lambda e: self.request_lane_analysis())
+        ttk.Label(control_frame, textvariable=self.lane_width).grid(row=3, column=5, padx=5, pady=2, sticky="w")
+        
+        auto_lanes_check = ttk.Checkbutton(control_frame, text="Auto Lanes", variable=self.auto_lanes,
+                                           command=self.request_lane_analysis)
+        auto_lanes_check.grid(row=4, column=0, columnspan=2, padx=5, pady=2, sticky="w")
+        
+        background_check = ttk.Checkbutton(control_frame, text="Flatten Background",
+                                           variable=self.background_correction,
+                                           command=self.request_detection)
+        background_check.grid(row=4, column=3, columnspan=3, padx=5, pady=2, sticky="w")
+        
+        # Detector backend: "blob" is the most faithful, "contours" the fastest
+        ttk.Label(control_frame, text="Detector:").grid(row=5, column=0, padx=5, pady=2, sticky="w")
+        detector_combo = ttk.Combobox(control_frame, textvariable=self.detector, state="readonly",
+                                      values=list(tlc_engine.DETECTORS), width=10)
+        detector_combo.grid(row=5, column=1, padx=5, pady=2, sticky="w")
+        detector_combo.bind("<<ComboboxSelected>>", lambda e: self.request_detection())
+        
+        # Controls - last row (buttons)
+        button_frame = Frame(control_frame)
+        button_frame.grid(row=6, column=0, columnspan=6, padx=5, pady=5, sticky="ew")
+        button_frame.columnconfigure(0, weight=1)
+        button_frame.columnconfigure(1, weight=1)
+        button_frame.columnconfigure(2, weight=1)
+        
+        ttk.Button(button_frame, text="Load Image", command=self.load_image).grid(row=0, column=0, padx=5, pady=5, sticky="ew")
+        ttk.Button(button_frame, text="Detect Spots", command=lambda: self.start_job("detect")).grid(row=0, column=1, padx=5, pady=5, sticky="ew")
+        ttk.Button(button_frame, text="Analyze Lanes", command=self.analyze_lanes).grid(row=0, column=2, padx=5, pady=5, sticky="ew")
+        ttk.Button(button_frame, text="Export Data", command=self.export_data).grid(row=0, column=3, padx=5, pady=5, sticky="ew")
+        
+        # Make all columns in control frame evenly sized
+        for i in range(6):
+            control_frame.columnconfigure(i, weight=1)
+        
+        # Tree view for spot data
+        data_frame = ttk.LabelFrame(self.right_frame, text="Spot Data")
+        data_frame.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
+        data_frame.columnconfigure(0, weight=1)
+        data_frame.rowconfigure(0, weight=1)
+        
+        # Only the visible part of the table is kept in the widget
+        columns = ["Spot #", "Lane", "Rf", "Area", "Saturation", "Rel Conc", "Compound"]
+        self.spot_table = SpotTable(data_frame, columns)
+        self.spot_table.frame.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
+        
+        # TLC metadata display
+        info_frame = ttk.LabelFrame(self.right_frame, text="TLC Information")
+        info_frame.grid(row=1, column=0, sticky="ew", padx=5, pady=5)
+        
+        self.info_text = ttk.Label(info_frame, text="No spots detected yet")
+        self.info_text.grid(row=0, column=0, padx=5, pady=5, sticky="w")
+        
+        # The other tabs are filled in the first time they are opened
+        self.tab_builders = {str(self.analysis_tab): self.create_analysis_tab,
+                             str(self.calibration_tab): self.create_calibration_tab}
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+    
+    def on_tab_changed(self, event=None):
+        tab = self.notebook.select()
+        builder = self.tab_builders.pop(tab, None)
+        if builder is not None:
+            builder()
+        if tab == str(self.analysis_tab) and self.plots_dirty:
+            self.update_plots()
+    
+    def create_analysis_tab(self):
+        # matplotlib is only imported once the Analysis tab is opened. The
+        # figures and their artists are created once and updated in place;
+        # they are plain Figures, not pyplot ones, so nothing keeps them
+        # alive once the window is gone.
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        
+        self.analysis_frame = Frame(self.analysis_tab)
+        self.analysis_frame.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
+        self.analysis_frame.columnconfigure(0, weight=1)
+        self.analysis_frame.rowconfigure(0, weight=1)
+        
+        plot_frame = ttk.LabelFrame(self.analysis_frame, text="Concentration Analysis")
+        plot_frame.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
+        self.concentration_figure = Figure(figsize=(10, 5), layout="tight")
+        self.concentration_canvas = FigureCanvasTkAgg(self.concentration_figure, master=plot_frame)
+        self.concentration_canvas.get_tk_widget().pack(fill="both", expand=True)
+        
+        # Plot 1: Rf vs Saturation (proxy for concentration), labelled with spot numbers
+        ax1, ax2 = self.concentration_figure.subplots(1, 2)
+        self.rf_scatter = ax1.scatter([], [], alpha=0.7)
+        self.spot_labels = []
+        ax1.set_xlabel("Rf Value")
+        ax1.set_ylabel("Saturation (Concentration)")
+        ax1.set_title("Rf vs Concentration")
+        ax1.grid(True, linestyle='--', alpha=0.7)
+        
+        # Plot 2: Spot size vs Saturation, colored by hue
+        self.area_scatter = ax2.scatter([], [], c=[], cmap="hsv", alpha=0.7)
+        ax2.set_xlabel("Spot Area")
+        ax2.set_ylabel("Saturation (Concentration)")
+        ax2.set_title("Area vs Concentration")
+        ax2.grid(True, linestyle='--', alpha=0.7)
+        
+        stats_frame = ttk.LabelFrame(self.analysis_frame, text="Statistical Summary")
+        stats_frame.grid(row=1, column=0, sticky="ew", padx=5, pady=5)
+        self.stats_text = ttk.Label(stats_frame, text="No spot data available for analysis")
+        self.stats_text.pack(padx=5, pady=5)
+        
+        # Concentration profiles by lane next to the densitogram; the frame
+        # is only shown while there are lanes
+        self.lane_plot_frame = ttk.LabelFrame(self.analysis_frame, text="Lane Analysis")
+        self.lane_figure = Figure(figsize=(12, 4), layout="tight")
+        self.lane_canvas = FigureCanvasTkAgg(self.lane_figure, master=self.lane_plot_frame)
+        self.lane_canvas.get_tk_widget().pack(fill="both", expand=True)
+        
+        ax, ax_profile = self.lane_figure.subplots(1, 2)
+        self.lane_artists = []
+        ax.set_xlabel("Rf Value")
+        ax.set_ylabel("Saturation (Concentration)")
+        ax.set_title("Concentration Profile by Lane")
+        ax.grid(True, linestyle='--', alpha=0.7)
+        ax_profile.set_xlabel("Rf Value")
+        ax_profile.set_ylabel("Intensity above baseline")
+        ax_profile.set_title("Lane Densitogram")
+        ax_profile.grid(True, linestyle='--', alpha=0.7)
+    
+    def create_calibration_tab(self):
+        import tlc_calibration
+        
+        self.calibration_frame = Frame(self.calibration_tab)
+        self.calibration_frame.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
+        self.calibration_frame.columnconfigure(0, weight=1)
+        self.calibration_frame.rowconfigure(0, weight=1)
+        
+        calibration_controls = ttk.LabelFrame(self.calibration_frame, text="Calibration Settings")
+        calibration_controls.grid(row=0, column=0, sticky="ew", padx=5, pady=5)
+        
+        ttk.Label(calibration_controls, text="Define standard spots for concentration calibration").grid(
+            row=0, column=0, columnspan=4, padx=5, pady=5, sticky="w")
+        ttk.Label(calibration_controls, text="Model:").grid(row=1, column=0, padx=5, pady=5, sticky="w")
+        ttk.Combobox(calibration_controls, textvariable=self.calibration_model, state="readonly",
+                     values=list(tlc_calibration.MODELS), width=16).grid(
+            row=1, column=1, padx=5, pady=5, sticky="w")
+        ttk.Button(calibration_controls, text="Load Reference Standards", 
+                  command=self.load_standards).grid(row=1, column=2, padx=5, pady=5, sticky="w")
+        ttk.Button(calibration_controls, text="Save Calibration",
+                  command=self.save_calibration).grid(row=1, column=3, padx=5, pady=5, sticky="w")
+        
+        self.calibration_text = ttk.Label(calibration_controls, text="No calibration loaded")
+        self.calibration_text.grid(row=2, column=0, columnspan=4, padx=5, pady=5, sticky="w")
+        
+        ttk.Button(calibration_controls, text="Load Reference Library",
+                   command=self.load_library).grid(row=3, column=0, padx=5, pady=5, sticky="w")
+        ttk.Button(calibration_controls, text="Use Built-in Library",
+                   command=self.use_builtin_library).grid(row=3, column=1, padx=5, pady=5, sticky="w")
+        self.library_text = ttk.Label(calibration_controls, text="No reference library loaded")
+        self.library_text.grid(row=3, column=2, columnspan=2, padx=5, pady=5, sticky="w")
+        
+        self.calibration_plot_frame = Frame(self.calibration_frame)
+        self.calibration_figure = None
+        self.calibration_plot_frame.grid(row=1, column=0, sticky="nsew", padx=5, pady=5)
+        self.calibration_frame.rowconfigure(0, weight=0)
+        self.calibration_frame.rowconfigure(1, weight=1)
+    
+    def load_image(self):
+        # Open file dialog to select image
+        file_path = filedialog.askopenfilename(
+            title="Select TLC Image", 
+            filetypes=[("Image files", "*.jpg;*.png;*.jpeg;*.tif;*.tiff")]
+        )
+        
+        if not file_path:
+            if self.image_path is None:  # If no previous image and user cancels
+                # Show a demo image or placeholder
+                ttk.Label(self.canvas_frame, text="Please load a TLC image to begin analysis").grid(
+                    row=0, column=0, padx=5, pady=5)
+            return
+            
+        self.image_path = file_path
+        with tlc_profile.recording() as timings:
+            self.img = tlc_engine.load_image(file_path, cache=self.cache)
+            
+            if self.img is None:
+                ttk.Label(self.canvas_frame, text="Failed to load image").grid(
+                    row=0, column=0, padx=5, pady=5)
+                return
+                
+            # Cache a downscaled copy for fast detection while tuning
+            self.image_key = tlc_engine.image_key_for_path(file_path)
+            with tlc_profile.span("preview"):
+                self.preview = self.cache.get((self.image_key, "preview"),
+                                              lambda: tlc_engine.make_preview(self.img))
+            
+            # Display the original image without overlays from the previous one
+            self.keypoints = None
+            self.lanes = []
+            with tlc_profile.span("display"):
+                self.display_image()
+        
+        # Update info
+        self.info_text.config(text=f"Image loaded: {os.path.basename(file_path)}\n"
+                              f"Size: {self.img.shape[1]}x{self.img.shape[0]}\n"
+                              f"Timing: {timings.summary()}")
+        
+        # Automatically detect spots with default parameters
+        self.start_job("detect", preview=True)
+    
+    def get_display_base(self, width, height):
+        # Screen-resolution copy of the current image, rebuilt only when the
+        # image, the canvas size or the invert setting changes
+        invert = bool(self.invert_image.get())
+        key = (self.image_key, id(self.img), width, height, invert)
+        if key != self.display_key:
+            img_height, img_width = self.img.shape[:2]
+            ratio = min(width / img_width, height / img_height)
+            new_width = max(1, int(img_width * ratio))
+            new_height = max(1, int(img_height * ratio))
+            
+            # Downscale from the cached preview when it is still large enough
+            source = self.img
+            if self.preview is not None and self.preview[0].shape[1] >= new_width:
+                source = self.preview[0]
+            interpolation = cv2.INTER_AREA if ratio < 1 else cv2.INTER_LINEAR
+            base = cv2.resize(source, (new_width, new_height), interpolation=interpolation)
+            if invert:
+                base = cv2.bitwise_not(base)  # Invert image for dark spots on light background
+            
+            self.display_base = base
+            self.display_scale = new_width / img_width
+            self.display_key = key
+        return self.display_base, self.display_scale
+    
+    def display_image(self):
+        if self.img is None:
+            return
+            
+        # Set initial size
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        
+        # Handle initial zero size
+        if width < 10:
+            width = min(800, self.img.shape[1])
+        if height < 10:
+            height = min(600, self.img.shape[0])
+        
+        # Draw spot and lane overlays on the small display image instead of
+        # a full-resolution copy
+        base, scale = self.get_display_base(width, height)
+        frame = tlc_engine.draw_spots(base, self.keypoints or [], scale)
+        if self.lanes and self.lane_model is not None:
+            frame = tlc_engine.draw_lanes(frame, self.lane_model, scale)
+        
+        # Convert OpenCV image to Tk format
+        rgb_img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        self.photo_image = ImageTk.PhotoImage(Image.fromarray(rgb_img))
+        
+        # Display on canvas
+        self.canvas.delete("all")
+        self.canvas.create_image(0, 0, anchor="nw", image=self.photo_image)
+        self.canvas.config(scrollregion=(0, 0, frame.shape[1], frame.shape[0]))
+    
+    def resize_image(self, event=None):
+        # Throttle <Configure> bursts while the window is being dragged
+        if self.resize_after is not None:
+            self.root.after_cancel(self.resize_after)
+        self.resize_after = self.root.after(RESIZE_MS, self.finish_resize)
+    
+    def finish_resize(self):
+        self.resize_after = None
+        self.display_image()
+    
+    def get_params(self):
+        # Snapshot the Tk control values into a plain parameter object
+        return DetectionParams(
+            min_area=self.min_area.get(),
+            max_area=self.max_area.get(),
+            min_circularity=self.min_circularity.get(),
+            threshold_min=self.threshold_min.get(),
+            threshold_max=self.threshold_max.get(),
+            invert_image=bool(self.invert_image.get()),
+            num_lanes=self.num_lanes.get(),
+            lane_width=self.lane_width.get(),
+            auto_lanes=bool(self.auto_lanes.get()),
+            background_correction=bool(self.background_correction.get()),
+            detector=self.detector.get(),
+        )
+    
+    def request_detection(self, preview=True):
+        # Debounce rapid parameter changes; only the last one within
+        # DEBOUNCE_MS actually starts a detection
+        self.schedule_job("detect", partial(self.start_job, "detect", preview))
+    
+    def request_lane_analysis(self):
+        self.schedule_job("lanes", partial(self.start_job, "lanes"))
+    
+    def schedule_job(self, kind, callback):
+        # Each kind has its own debounce timer, so a lane request never
+        # swallows a detection scheduled just before it
+        self.cancel_scheduled(kind)
+        self.pending_after[kind] = self.root.after(DEBOUNCE_MS, callback)
+    
+    def cancel_scheduled(self, kind):
+        after_id = self.pending_after.pop(kind, None)
+        if after_id is not None:
+            self.root.after_cancel(after_id)
+    
+    def start_job(self, kind, preview=False, post=True):
+        self.pending_after.pop(kind, None)
+        if self.img is None:
+            return None
+        
+        # A detection supersedes everything still queued or running. A lane
+        # request only supersedes older lane requests: it runs after a
+        # pending detection (the worker is single-threaded) on its result.
+        self.generation += 1
+        if kind == "detect":
+            self.detect_generation = self.generation
+            superseded = list(self.pending_futures)
+        else:
+            superseded = ["lanes"]
+        for name in superseded:
+            future = self.pending_futures.pop(name, None)
+            if future is not None:
+                future.cancel()
+        
+        # Tk variables are read here, on the main thread, never in the worker;
+        # slider changes detect on the cached preview, "Detect Spots" at full resolution
+        params = self.get_params()
+        if kind == "detect":
+            preview = self.preview if preview else None
+            job = partial(self.detection_job, self.generation, self.img, self.image_key,
+                          params, preview, post, self.calibration, self.library)
+        else:
+            job = partial(self.lane_job, self.generation, params)
+        future = self.executor.submit(job)
+        self.pending_futures[kind] = future
+        return future
+    
+    def detection_job(self, generation, img, image_key, params, preview, post=True,
+                      calibration=None, library=None):
+        # Runs on the worker thread - no Tk calls in here
+        if generation != self.detect_generation:
+            return None
+        with tlc_profile.recording() as timings:
+            keypoints, blob_data = tlc_engine.detect_spots(img, params, preview=preview,
+                                                           cache=self.cache, image_key=image_key)
+            with tlc_profile.span("annotate"):
+                if library is not None:
+                    blob_data = library.annotate(blob_data)
+                if calibration is not None:
+                    blob_data = calibration.apply(blob_data)
+        
+        # Keep the latest detection so a following lane request can build on it
+        self.worker_state = {
+            "img": img,
+            "image_key": image_key,
+            "keypoints": keypoints,
+            "blob_data": blob_data,
+            "is_preview": preview is not None,
+        }
+        if generation != self.detect_generation:
+            return None
+        
+        # If we already have lanes set up, update the lane analysis as well
+        with tlc_profile.recording(timings):
+            result = self.lane_result(self.worker_state, params,
+                                      params.num_lanes > 1 or params.auto_lanes)
+        result["kind"] = "detect"
+        result["timings"] = timings
+        if post:
+            self.results.put((generation, result))
+        return result
+    
+    def lane_job(self, generation, params):
+        state = self.worker_state
+        if generation != self.generation or state is None or len(state["blob_data"]) == 0:
+            return None
+        with tlc_profile.recording() as timings:
+            result = self.lane_result(state, params, True)
+        result["kind"] = "lanes"
+        result["timings"] = timings
+        self.results.put((generation, result))
+        return result
+    
+    def lane_result(self, state, params, with_lanes):
+        import tlc_densitometry
+        
+        result = dict(state, params=params, lanes=[], lane_model=None, profiles=None, peaks=None)
+        if with_lanes and len(state["blob_data"]) > 0:
+            # Uniform lanes from the sliders, or lanes found from the plate itself
+            img, image_key = state["img"], state["image_key"]
+            lane_model = tlc_engine.lane_model_for(img, params, self.cache, image_key)
+            result["lane_model"] = lane_model
+            
+            # Update lane assignments in blob data and group spots by lane
+            result["blob_data"], result["lanes"] = tlc_engine.analyze_lanes(
+                state["blob_data"], img.shape[1], len(lane_model), lane_model)
+            
+            # Densitogram of every lane band (reuses the cached grayscale image)
+            gray = tlc_engine.grayscale(img, self.cache, image_key)
+            profiles, baselines, result["peaks"] = tlc_densitometry.densitogram(
+                img, params, lane_model, gray=gray)
+            result["profiles"] = profiles - baselines
+        return result
+    
+    def poll_results(self):
+        # Apply only the newest detection and the newest request; anything
+        # older was superseded. A detection followed by a lane request gives
+        # two results, applied in the order the worker produced them.
+        current = []
+        while True:
+            try:
+                generation, result = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if generation == self.generation or (result["kind"] == "detect"
+                                                 and generation == self.detect_generation):
+                current.append(result)
+        
+        for result in current:
+            self.apply_result(result)
+        self.root.after(POLL_MS, self.poll_results)
+    
+    def apply_result(self, result):
+        self.keypoints = result["keypoints"]
+        self.blob_data = result["blob_data"]
+        self.lanes = result["lanes"]
+        self.lane_model = result["lane_model"]
+        if self.lane_model is not None and result["params"].auto_lanes:
+            # Show how many lanes were found
+            self.num_lanes.set(len(self.lane_model))
+        self.lane_profiles = result["profiles"]
+        self.lane_peaks = result["peaks"]
+        self.detection_is_preview = result["is_preview"]
+        
+        # The Tk-side work is timed into the same record as the worker's
+        timings = result.get("timings") or tlc_profile.Timings()
+        with tlc_profile.recording(timings):
+            # Display the image with detected spots (and lanes)
+            with tlc_profile.span("display"):
+                self.display_image()
+            
+            # Update the tree view
+            with tlc_profile.span("table"):
+                self.update_tree_view()
+            
+            # Plots are only drawn while the Analysis tab is showing;
+            # otherwise they are redrawn when it is next opened
+            self.plots_dirty = True
+            if self.notebook.select() == str(self.analysis_tab):
+                with tlc_profile.span("plots"):
+                    self.update_plots()
+        
+        if result["kind"] == "detect":
+            # Update info
+            params = result["params"]
+            if len(self.keypoints) > 0:
+                mode = " (preview)" if self.detection_is_preview else ""
+                self.info_text.config(text=f"Detected {len(self.keypoints)} spots{mode}\n"
+                                    f"Parameters: Area: {params.min_area}-{params.max_area}, "
+                                    f"Circularity: {params.min_circularity:.2f}\n"
+                                    f"Timing: {timings.summary()}")
+            else:
+                self.info_text.config(text="No spots detected with current parameters.\n"
+                                    "Try adjusting the area, circularity, or threshold values.\n"
+                                    f"Timing: {timings.summary()}")
+    
+    def detect_spots(self, preview=False):
+        # Blocking detection for callers that need the result right away
+        # (e.g. export); still goes through the worker so it cannot race it
+        self.cancel_scheduled("detect")
+        future = self.start_job("detect", preview, post=False)
+        if future is None:
+            return
+        result = future.result()
+        if result is not None:
+            self.apply_result(result)
+    
+    def update_tree_view(self):
+        self.spot_table.set_data(self.blob_data)
+    
+    def analyze_lanes(self):
+        self.start_job("lanes")
+    
+    def update_plots(self):
+        # Only called while the Analysis tab is showing
+        self.plots_dirty = False
+        self.update_concentration_plot()
+        self.update_lane_analysis_plots()
+    
+    def update_concentration_plot(self):
+        has_data = self.blob_data is not None and len(self.blob_data) > 0
+        if has_data:
+            rf = self.blob_data["Rf"].to_numpy(np.float64)
+            saturation = self.blob_data["Saturation"].to_numpy(np.float64)
+            area = self.blob_data["Area"].to_numpy(np.float64)
+            hue = self.blob_data["Hue"].to_numpy(np.float64)
+            spot_numbers = self.blob_data["Spot #"].to_numpy()
+        else:
+            rf = saturation = area = hue = spot_numbers = np.empty(0)
+        
+        rf_points = np.column_stack([rf, saturation])
+        self.rf_scatter.set_offsets(rf_points)
+        self.rf_scatter.set_sizes(area / 10)
+        area_points = np.column_stack([area, saturation])
+        self.area_scatter.set_offsets(area_points)
+        self.area_scatter.set_array(hue)
+        self.area_scatter.autoscale()
+        
+        # Spot number labels are reused; spare ones are hidden
+        ax1 = self.rf_scatter.axes
+        while len(self.spot_labels) < len(rf):
+            self.spot_labels.append(ax1.annotate("", (0, 0), fontsize=8))
+        for i, label in enumerate(self.spot_labels):
+            if i < len(rf):
+                label.set_text(f"{int(spot_numbers[i])}")
+                # xy is the annotated point, the position is where the text goes
+                label.xy = (rf[i], saturation[i])
+                label.set_position(label.xy)
+            label.set_visible(i < len(rf))
+        
+        rescale_axes(ax1, rf_points)
+        rescale_axes(self.area_scatter.axes, area_points)
+        self.concentration_canvas.draw_idle()
+        
+        if has_data:
+            self.stats_text.config(text=f"Mean Saturation: {saturation.mean():.2f}\n"
+                                   f"Max Saturation: {saturation.max():.2f}\n"
+                                   f"Mean Spot Area: {area.mean():.2f}")
+        else:
+            self.stats_text.config(text="No spot data available for analysis")
+    
+    def lane_artist(self, i):
+        # Scatter, trend line, profile and peak markers of lane i, created
+        # the first time that many lanes are shown
+        ax, ax_profile = self.lane_figure.axes
+        while len(self.lane_artists) <= i:
+            n = len(self.lane_artists)
+            color = LANE_COLORS[n % len(LANE_COLORS)]
+            self.lane_artists.append({
+                "scatter": ax.scatter([], [], label=f"Lane {n+1}", color=color, alpha=0.7),
+                "trend": ax.plot([], [], '--', color=color, alpha=0.5)[0],
+                "profile": ax_profile.plot([], [], color=color, alpha=0.8, label=f"Lane {n+1}")[0],
+                "peaks": ax_profile.scatter([], [], color=color, marker="v"),
+            })
+        return self.lane_artists[i]
+    
+    def update_lane_analysis_plots(self):
+        if not self.lanes:
+            self.lane_plot_frame.grid_remove()
+            return
+        self.lane_plot_frame.grid(row=2, column=0, sticky="nsew", padx=5, pady=5)
+        ax, ax_profile = self.lane_figure.axes
+        
+        num_profiles = 0 if self.lane_profiles is None else self.lane_profiles.shape[1]
+        for i in range(len(self.lanes)):
+            self.lane_artist(i)
+        for i in range(num_profiles):
+            self.lane_artist(i)
+        
+        lane_points, peak_points, shown = [], [], []
+        for i, artists in enumerate(self.lane_artists):
+            lane_data = self.lanes[i] if i < len(self.lanes) else None
+            if lane_data is not None and len(lane_data) > 0:
+                # Sorted by Rf so the trend line runs along the plate
+                lane_data = lane_data.sort_values("Rf")
+                points = np.column_stack([lane_data["Rf"].to_numpy(np.float64),
+                                          lane_data["Saturation"].to_numpy(np.float64)])
+                lane_points.append(points)
+                shown.append(artists["scatter"])
+            else:
+                points = np.empty((0, 2))
+            artists["scatter"].set_offsets(points)
+            artists["trend"].set_data(points[:, 0], points[:, 1])
+            artists["trend"].set_visible(len(points) > 1)
+            
+            # Baseline-corrected lane profiles with the integrated peaks marked
+            if i < num_profiles:
+                rows = self.lane_profiles.shape[0]
+                artists["profile"].set_data(1.0 - np.arange(rows) / rows, self.lane_profiles[:, i])
+                lane_peaks = self.lane_peaks[self.lane_peaks["Lane"] == i + 1]
+                peaks = np.column_stack([lane_peaks["Rf"].to_numpy(np.float64),
+                                         lane_peaks["Height"].to_numpy(np.float64)])
+                peak_points.append(peaks)
+            else:
+                peaks = np.empty((0, 2))
+            artists["profile"].set_visible(i < num_profiles)
+            artists["peaks"].set_offsets(peaks)
+        
+        ax.legend(handles=shown)
+        rescale_axes(ax, np.concatenate(lane_points) if lane_points else np.empty((0, 2)))
+        rescale_axes(ax_profile, np.concatenate(peak_points) if peak_points else np.empty((0, 2)))
+        self.lane_canvas.draw_idle()
+    
+    def load_standards(self):
+        # Standards are a spot table (e.g. an export) with the standard spots
+        # annotated with Compound and Concentration columns, or a saved calibration
+        file_path = filedialog.askopenfilename(
+            title="Select Reference Standards",
+            filetypes=[("Standards or calibration", "*.csv;*.json"), ("All files", "*.*")]
+        )
+        if not file_path:
+            return
+        import pandas as pd
+        import tlc_calibration
+        
+        try:
+            if file_path.lower().endswith(".json"):
+                standards = None
+                calibration = tlc_calibration.Calibration.load(file_path)
+            else:
+                standards = pd.read_csv(file_path)
+                calibration = tlc_calibration.Calibration.fit(
+                    standards, model=self.calibration_model.get())
+        except (OSError, ValueError, KeyError) as e:
+            self.calibration_text.config(text=f"Could not load {os.path.basename(file_path)}: {e}")
+            return
+        
+        self.calibration = calibration
+        self.standards = standards
+        self.calibration_text.config(text=calibration.summary() or "No curves in calibration")
+        self.create_calibration_plot(calibration)
+        
+        # Re-run detection so the spot table gets concentrations
+        self.request_detection(preview=self.detection_is_preview)
+    
+    def load_library(self):
+        # JSON reference library, as written by tlc_library.ReferenceLibrary.save
+        file_path = filedialog.askopenfilename(
+            title="Select Reference Library",
+            filetypes=[("Reference library", "*.json"), ("All files", "*.*")]
+        )
+        if not file_path:
+            return
+        try:
+            self.library = tlc_library.ReferenceLibrary.load(file_path)
+        except (OSError, ValueError, TypeError) as e:
+            self.library_text.config(text=f"Could not load {os.path.basename(file_path)}: {e}")
+            return
+        self.library_text.config(text=f"{os.path.basename(file_path)}: {len(self.library)} compounds")
+        self.request_detection(preview=self.detection_is_preview)
+    
+    def use_builtin_library(self):
+        # Example cannabinoid standards, as `--library default` in batch mode
+        self.library = tlc_library.ReferenceLibrary()
+        self.library_text.config(text=f"Built-in library: {len(self.library)} compounds")
+        self.request_detection(preview=self.detection_is_preview)
+    
+    def save_calibration(self):
+        if self.calibration is None:
+            return
+        file_path = filedialog.asksaveasfilename(
+            title="Save Calibration",
+            defaultextension=".json",
+            filetypes=[("Calibration", "*.json")]
+        )
+        if file_path:
+            self.calibration.save(file_path)
+            self.calibration_text.config(text=f"{self.calibration.summary()}\n"
+                                         f"Saved to {os.path.basename(file_path)}")
+    
+    def create_calibration_plot(self, calibration):
+        # One figure for the tab, cleared and redrawn for every new calibration
+        if self.calibration_figure is None:
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            
+            self.calibration_figure = Figure(figsize=(6, 4), layout="tight")
+            self.calibration_canvas = FigureCanvasTkAgg(self.calibration_figure,
+                                                        master=self.calibration_plot_frame)
+            self.calibration_canvas.get_tk_widget().pack(fill="both", expand=True)
+        fig = self.calibration_figure
+        fig.clear()
+        if len(calibration) == 0:
+            self.calibration_canvas.draw_idle()
+            return
+        
+        ax = fig.subplots()
+        standards = self.standards
+        for curve in calibration.curves:
+            conc = np.linspace(0, curve.conc_max, 200)
+            line, = ax.plot(conc, curve.predict(conc), label=f"{curve.compound} ({curve.model})")
+            if standards is not None and "Compound" in standards:
+                points = standards[standards["Compound"] == curve.compound]
+                ax.scatter(points["Concentration"], points[curve.response], color=line.get_color())
+        ax.set_xlabel("Concentration")
+        ax.set_ylabel(calibration.curves[0].response)
+        ax.set_title("Calibration Curves")
+        ax.legend()
+        ax.grid(True, linestyle='--', alpha=0.7)
+        self.calibration_canvas.draw_idle()
+    
+    def on_close(self):
+        # Drop queued work; a running detection finishes in the background
+        self.generation += 1
+        self.detect_generation = self.generation
+        for future in self.pending_futures.values():
+            future.cancel()
+        self.executor.shutdown(wait=False)
+        self.root.destroy()
+    
+    def export_data(self):
+        # Exports always use full-resolution detection
+        if self.detection_is_preview:
+            self.detect_spots()
+        
+        if self.blob_data is None or len(self.blob_data) == 0:
+            return
+            
+        # Ask user for save location
+        file_path = filedialog.asksaveasfilename(
+            title="Save TLC Analysis Data",
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("Parquet files", "*.parquet"),
+                       ("Arrow files", "*.arrow"), ("Excel files", "*.xlsx"),
+                       ("Results store", "*.db;*.sqlite")]
+        )
+        
+        if not file_path:
+            return
+            
+        # Export the data
+        if file_path.endswith((".csv", ".parquet", ".arrow")):
+            import tlc_export
+            try:
+                tlc_export.write_table(file_path, self.blob_data)
+            except ImportError as e:
+                self.info_text.config(text=str(e))
+                return
+        elif file_path.endswith(".xlsx"):
+            self.blob_data.to_excel(file_path, index=False)
+        elif file_path.endswith((".db", ".sqlite")):
+            # Append this plate to a results store shared with batch runs
+            import tlc_store
+            with tlc_store.ResultStore(file_path) as store:
+                params_key = tlc_store.parameter_hash(self.get_params(), self.calibration,
+                                                      self.library)
+                store.add_plate(self.image_path, store.image_hash(self.image_path), params_key,
+                                self.get_params(), self.blob_data)
+        
+        # Inform user
+        self.info_text.config(text=f"Data exported to {os.path.basename(file_path)}")
+
+
+def rescale_axes(ax, points):
+    # Fit the view to the updated data; relim only covers lines, so the
+    # points of scatter collections are added by hand
+    ax.relim(visible_only=True)
+    if len(points):
+        ax.update_datalim(points)
+    ax.autoscale_view()
+
+
+def run():
+    root = Tk()
+    app = TLCAnalyzer(root)
+    root.mainloop()
+    return 0
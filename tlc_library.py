@@ -0,0 +1,143 @@
+"""Reference library for compound identification.
+
+Known standards are described by an Rf range, a hue range and the
+development conditions they were measured under. The Rf ranges are
+turned into an elementary-interval index (sorted boundaries plus a padded
+candidate table), so every spot finds its candidate compounds with one
+binary search and the hue check runs on whole arrays at once.
+"""
+import json
+from dataclasses import dataclass, asdict
+
+import numpy as np
+
+LIBRARY_VERSION = 1
+
+
+@dataclass
+class ReferenceEntry:
+    # Hue uses OpenCV's 0-179 scale; hue_min > hue_max wraps around red
+    compound: str
+    rf_min: float
+    rf_max: float
+    hue_min: float = 0.0
+    hue_max: float = 179.0
+    conditions: str = ""
+    notes: str = ""
+
+
+# Typical cannabinoid standards on silica with hexane/diethyl ether (8:2)
+# and Fast Blue BB staining. Rf values shift with plate, chamber saturation
+# and temperature, so labs should replace these with their own standards.
+DEFAULT_CONDITIONS = "silica, hexane/diethyl ether 8:2, Fast Blue BB"
+DEFAULT_ENTRIES = [
+    ReferenceEntry("CBD", 0.60, 0.72, 5, 22, DEFAULT_CONDITIONS, "orange"),
+    ReferenceEntry("CBC", 0.56, 0.66, 140, 175, DEFAULT_CONDITIONS, "pink-violet"),
+    ReferenceEntry("THC", 0.50, 0.60, 170, 8, DEFAULT_CONDITIONS, "red"),
+    ReferenceEntry("CBN", 0.42, 0.52, 125, 160, DEFAULT_CONDITIONS, "violet"),
+    ReferenceEntry("CBG", 0.36, 0.46, 5, 22, DEFAULT_CONDITIONS, "orange"),
+    ReferenceEntry("THCA", 0.12, 0.24, 170, 8, DEFAULT_CONDITIONS, "red"),
+    ReferenceEntry("CBDA", 0.08, 0.20, 5, 22, DEFAULT_CONDITIONS, "orange"),
+]
+
+
+class ReferenceLibrary:
+    def __init__(self, entries=None):
+        self.entries = list(DEFAULT_ENTRIES if entries is None else entries)
+        self.build_index()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def build_index(self):
+        # Entry attributes as arrays, plus the elementary intervals between
+        # all sorted Rf range boundaries. Row i of the candidate table holds
+        # every entry overlapping [boundaries[i], boundaries[i + 1]], padded
+        # with -1 to the largest overlap count.
+        entries = self.entries
+        self.names = np.array([e.compound for e in entries] + [""], dtype=object)
+        self.rf_min = np.array([e.rf_min for e in entries], dtype=np.float64)
+        self.rf_max = np.array([e.rf_max for e in entries], dtype=np.float64)
+        self.hue_min = np.array([e.hue_min for e in entries], dtype=np.float64)
+        self.hue_max = np.array([e.hue_max for e in entries], dtype=np.float64)
+
+        self.boundaries = np.unique(np.concatenate([self.rf_min, self.rf_max]))
+        lower = self.boundaries
+        upper = np.append(self.boundaries[1:], self.boundaries[-1:])
+        overlap = ((self.rf_min[None, :] <= upper[:, None]) &
+                   (self.rf_max[None, :] >= lower[:, None]))
+        width = max(1, int(overlap.sum(axis=1).max())) if len(entries) else 1
+        table = np.full((len(lower), width), -1, dtype=np.intp)
+        rows, cols = np.nonzero(overlap)
+        slots = np.arange(len(rows)) - np.searchsorted(rows, rows)
+        table[rows, slots] = cols
+        self.candidate_table = table
+
+    def candidates(self, rf, hue=None):
+        # (spots, k) matrix of candidate entry indices, -1 where a slot is
+        # empty or the spot falls outside the entry's Rf or hue range
+        rf = np.asarray(rf, dtype=np.float64)
+        if len(self.entries) == 0:
+            return np.full((len(rf), 1), -1, dtype=np.intp)
+        interval = np.searchsorted(self.boundaries, rf, side="right") - 1
+        outside = (interval < 0) | (rf > self.boundaries[-1])
+        cand = self.candidate_table[np.clip(interval, 0, None)]
+        cand[outside] = -1
+
+        # Exact range checks on the few candidates of each spot
+        safe = np.where(cand >= 0, cand, 0)
+        ok = (cand >= 0) & (self.rf_min[safe] <= rf[:, None]) & (rf[:, None] <= self.rf_max[safe])
+        if hue is not None:
+            hue = np.asarray(hue, dtype=np.float64)[:, None]
+            lo, hi = self.hue_min[safe], self.hue_max[safe]
+            ok &= np.where(lo <= hi, (hue >= lo) & (hue <= hi), (hue >= lo) | (hue <= hi))
+        return np.where(ok, cand, -1)
+
+    def match(self, rf, hue=None):
+        # Best candidate of every spot and how many candidates it had. The
+        # best one is the entry whose Rf range center is closest relative to
+        # the range width; spots without a match get index -1.
+        rf = np.asarray(rf, dtype=np.float64)
+        cand = self.candidates(rf, hue)
+        count = (cand >= 0).sum(axis=1)
+        if len(self.entries) == 0:
+            return cand[:, 0], count
+
+        safe = np.where(cand >= 0, cand, 0)
+        center = (self.rf_min[safe] + self.rf_max[safe]) / 2
+        half = np.maximum((self.rf_max[safe] - self.rf_min[safe]) / 2, 1e-9)
+        distance = np.where(cand >= 0, np.abs(rf[:, None] - center) / half, np.inf)
+        best = cand[np.arange(len(rf)), distance.argmin(axis=1)]
+        return best, count
+
+    def annotate(self, blob_data):
+        # Returns a copy of the spot table with "Compound" (empty when nothing
+        # matches) and the number of "Candidates" for each spot
+        best, count = self.match(blob_data["Rf"].to_numpy(),
+                                 blob_data["Hue"].to_numpy() if "Hue" in blob_data else None)
+        blob_data = blob_data.copy()
+        blob_data["Compound"] = self.names[best]
+        blob_data["Candidates"] = count.astype(np.int32)
+        return blob_data
+
+    def for_conditions(self, conditions):
+        # Library restricted to entries measured under the given conditions
+        return ReferenceLibrary([e for e in self.entries if e.conditions == conditions])
+
+    def to_dict(self):
+        return {"version": LIBRARY_VERSION, "entries": [asdict(e) for e in self.entries]}
+
+    @classmethod
+    def from_dict(cls, values):
+        known = ReferenceEntry.__dataclass_fields__
+        return cls([ReferenceEntry(**{k: v for k, v in entry.items() if k in known})
+                    for entry in values.get("entries", [])])
+
+    def save(self, file_path):
+        with open(file_path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, file_path):
+        with open(file_path) as f:
+            return cls.from_dict(json.load(f))
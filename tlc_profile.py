@@ -0,0 +1,162 @@
+"""Timing and memory instrumentation for the analysis pipeline.
+
+Pipeline stages are wrapped in named spans. Spans only cost a context
+variable lookup unless a record is active, so they stay in the code
+permanently:
+
+    with tlc_profile.recording() as timings:
+        tlc_engine.detect_spots(img, params)
+    print(timings.summary())
+
+Each thread (GUI worker, batch worker process) records into its own
+active Timings. profile_call runs one call under cProfile.
+"""
+import contextvars
+import cProfile
+import io
+import pstats
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak RSS is then not reported
+    resource = None
+
+_current = contextvars.ContextVar("tlc_timings", default=None)
+
+
+def peak_rss_mb():
+    # Resident memory high-water mark of this process since it started (not
+    # of the current plate), or None if unknown
+    if resource is None:
+        return None
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024.0 * 1024.0) if sys.platform == "darwin" else rss / 1024.0
+
+
+class Timings:
+    # Per-plate timing record: seconds per named span (repeated spans add
+    # up), plus memory high-water marks. With trace_memory the peak of
+    # Python/NumPy allocations inside each span is tracked with tracemalloc,
+    # which is accurate but slows allocation-heavy code down. peak_rss is
+    # the recording process's lifetime high-water mark, so in a batch it is
+    # the largest footprint the worker has reached so far.
+    def __init__(self, trace_memory=False):
+        self.spans = OrderedDict()
+        self.counts = OrderedDict()
+        self.span_peaks = OrderedDict()
+        self.trace_memory = trace_memory
+        self.peak_rss = None
+        # tracemalloc has a single peak, which every span resets; each open
+        # span keeps the peak it reached before its inner spans reset it
+        self._open_peaks = []
+
+    @contextmanager
+    def span(self, name):
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            if self._open_peaks:
+                self._open_peaks[-1] = max(self._open_peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self._open_peaks.append(0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.spans[name] = self.spans.get(name, 0.0) + elapsed
+            self.counts[name] = self.counts.get(name, 0) + 1
+            if tracing:
+                peak = max(self._open_peaks.pop(), tracemalloc.get_traced_memory()[1])
+                if self._open_peaks:
+                    self._open_peaks[-1] = max(self._open_peaks[-1], peak)
+                peak /= 1024.0 * 1024.0
+                self.span_peaks[name] = max(self.span_peaks.get(name, 0.0), peak)
+            self.update_memory()
+
+    def update_memory(self):
+        rss = peak_rss_mb()
+        if rss is not None:
+            self.peak_rss = max(self.peak_rss or 0.0, rss)
+
+    def total(self):
+        return sum(self.spans.values())
+
+    def to_dict(self):
+        # Flat record for CSV output: milliseconds per span and memory in MB
+        record = {f"{name} ms": round(seconds * 1000.0, 2) for name, seconds in self.spans.items()}
+        record["total ms"] = round(self.total() * 1000.0, 2)
+        for name, peak in self.span_peaks.items():
+            record[f"{name} peak MB"] = round(peak, 1)
+        if self.peak_rss is not None:
+            record["worker peak RSS MB"] = round(self.peak_rss, 1)
+        return record
+
+    def summary(self):
+        # One line for the info panel and logs, slowest spans first
+        parts = [f"{name} {seconds * 1000.0:.0f} ms"
+                 for name, seconds in sorted(self.spans.items(), key=lambda item: -item[1])]
+        text = ", ".join(parts) or "nothing timed"
+        if self.peak_rss is not None:
+            text += f" | process peak RSS {self.peak_rss:.0f} MB"
+        if self.span_peaks:
+            name, peak = max(self.span_peaks.items(), key=lambda item: item[1])
+            text += f" | largest allocation peak {peak:.0f} MB in {name}"
+        return text
+
+    def merge(self, other):
+        for name, seconds in other.spans.items():
+            self.spans[name] = self.spans.get(name, 0.0) + seconds
+            self.counts[name] = self.counts.get(name, 0) + other.counts.get(name, 1)
+        for name, peak in other.span_peaks.items():
+            self.span_peaks[name] = max(self.span_peaks.get(name, 0.0), peak)
+        if other.peak_rss is not None:
+            self.peak_rss = max(self.peak_rss or 0.0, other.peak_rss)
+
+
+@contextmanager
+def recording(timings=None, trace_memory=False):
+    # Make timings (a new Timings by default) the active record of this
+    # thread for the duration of the block
+    if timings is None:
+        timings = Timings(trace_memory)
+    started_tracing = timings.trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+        timings.update_memory()
+        if started_tracing:
+            tracemalloc.stop()
+
+
+@contextmanager
+def span(name):
+    # Time a block into the active record; free when nothing is recording
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    with timings.span(name):
+        yield
+
+
+def profile_call(func, *args, output=None, sort="cumulative", limit=25, **kwargs):
+    # Run one call under cProfile; returns (result, report text). The raw
+    # statistics are written to output (for snakeviz/pstats) if given.
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args, **kwargs)
+    if output:
+        profiler.dump_stats(output)
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats(sort).print_stats(limit)
+    return result, text.getvalue()
@@ -0,0 +1,409 @@
+"""Local HTTP analysis service.
+
+Plate images are POSTed to /analyze and answered with the spot table and
+lane results as JSON. Requests are handled by a pool of warm worker
+processes that import OpenCV and the engine once at startup; concurrent
+requests are collected into small batches so one pool task serves
+several images. GET /stats reports throughput, latency and batching.
+The server only listens on localhost.
+"""
+import argparse
+import concurrent.futures
+import json
+import math
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+import tlc_batch
+import tlc_engine
+import tlc_profile
+from tlc_engine import DetectionParams
+
+DEFAULT_PORT = 8765
+DEFAULT_BATCH_WINDOW = 0.01
+DEFAULT_MAX_BATCH = 16
+MAX_BODY_BYTES = 256 * 1024 * 1024
+# Requests waiting for a worker before new ones are turned away with 503
+MAX_PENDING = 256
+REQUEST_TIMEOUT = 300.0
+
+# Worker process state, set once by _init_worker
+_calibration = None
+_library = None
+
+
+def _init_worker(calibration=None, library=None):
+    # Import and warm up everything a request needs, once per process
+    global _calibration, _library
+    tlc_batch._init_worker()
+    import tlc_densitometry  # noqa: F401
+    if calibration is not None:
+        import tlc_calibration
+        _calibration = tlc_calibration.Calibration.from_dict(calibration)
+    if library is not None:
+        import tlc_library
+        _library = tlc_library.ReferenceLibrary.from_dict(library)
+    tlc_engine.analyze_image(np.zeros((64, 64, 3), dtype=np.uint8), DetectionParams())
+
+
+def _records(table):
+    # pandas -> JSON-ready rows (NaN becomes null)
+    return json.loads(table.to_json(orient="records"))
+
+
+def analyze_bytes(data, params, peaks=False):
+    # Decode and analyze one encoded image; returns a JSON-ready dict
+    import cv2
+    import tlc_densitometry
+
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return {"error": "could not decode image"}
+    _, blob_data, lanes = tlc_engine.analyze_image(img, params)
+    if _library is not None:
+        blob_data = _library.annotate(blob_data)
+    if _calibration is not None:
+        blob_data = _calibration.apply(blob_data)
+
+    result = {
+        "width": img.shape[1],
+        "height": img.shape[0],
+        "spots": _records(blob_data),
+        "lanes": [{"Lane": i + 1,
+                   "Spots": len(lane),
+                   "Mean Rf": round(float(lane["Rf"].mean()), 3) if len(lane) else None,
+                   "Integrated Intensity": float(lane["Integrated Intensity"].sum())}
+                  for i, lane in enumerate(lanes)],
+    }
+    if peaks:
+        lane_model = tlc_engine.lane_model_for(img, params)
+        result["peaks"] = _records(tlc_densitometry.densitogram(img, params, lane_model)[2])
+    return result
+
+
+def analyze_batch(requests):
+    # One pool task: a list of (data, params, peaks) analyzed back to back
+    results = []
+    for data, params, peaks in requests:
+        with tlc_profile.recording() as timings:
+            try:
+                result = analyze_bytes(data, params, peaks)
+            except Exception as e:
+                result = {"error": str(e)}
+        result["timings"] = timings.to_dict()
+        results.append(result)
+    return results
+
+
+class ServiceStats:
+    def __init__(self, window=1000):
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.restarts = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.latencies = deque(maxlen=window)
+
+    def record_batch(self, size):
+        with self.lock:
+            self.batches += 1
+            self.batched_requests += size
+
+    def record_request(self, latency, error=False):
+        with self.lock:
+            self.requests += 1
+            self.errors += error
+            self.latencies.append(latency)
+
+    def to_dict(self, pending=0):
+        with self.lock:
+            elapsed = time.perf_counter() - self.start
+            stats = {
+                "uptime_s": round(elapsed, 1),
+                "requests": self.requests,
+                "errors": self.errors,
+                "rejected": self.rejected,
+                "pool_restarts": self.restarts,
+                "pending": pending,
+                "throughput_per_s": round(self.requests / elapsed, 3) if elapsed > 0 else 0.0,
+                "batches": self.batches,
+                "mean_batch_size": (round(self.batched_requests / self.batches, 2)
+                                    if self.batches else 0.0),
+            }
+            if self.latencies:
+                p50, p95, p99 = np.percentile(np.array(self.latencies), [50, 95, 99])
+                stats.update(latency_p50_s=round(p50, 4), latency_p95_s=round(p95, 4),
+                             latency_p99_s=round(p99, 4))
+            return stats
+
+
+class AnalysisService:
+    # Micro-batching front end of the worker pool. Request threads call
+    # submit(); a dispatcher thread gathers requests for up to batch_window
+    # seconds (or max_batch requests), splits them evenly over the workers
+    # and resolves each request's Future when its batch finishes. A pool
+    # broken by a crashed worker fails the requests it was running and is
+    # replaced before the next batch.
+    def __init__(self, workers=None, batch_window=DEFAULT_BATCH_WINDOW,
+                 max_batch=DEFAULT_MAX_BATCH, calibration=None, library=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.stats = ServiceStats()
+        self.pending = queue.Queue(maxsize=MAX_PENDING)
+        self.initargs = (calibration.to_dict() if calibration is not None else None,
+                         library.to_dict() if library is not None else None)
+        self.executor = self.start_pool()
+        self.running = True
+        self.dispatcher = threading.Thread(target=self.dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def start_pool(self):
+        executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                       initargs=self.initargs)
+        # Start every worker now instead of on the first request
+        for future in [executor.submit(analyze_batch, []) for _ in range(self.workers)]:
+            future.result()
+        return executor
+
+    def restart_pool(self):
+        self.executor.shutdown(wait=False)
+        self.executor = self.start_pool()
+        with self.stats.lock:
+            self.stats.restarts += 1
+
+    def submit(self, data, params, peaks=False):
+        # Returns a Future with the result dict; raises queue.Full when the
+        # service is saturated
+        future = Future()
+        try:
+            self.pending.put_nowait((data, params, peaks, future))
+        except queue.Full:
+            with self.stats.lock:
+                self.stats.rejected += 1
+            raise
+        return future
+
+    def dispatch(self):
+        while self.running:
+            try:
+                batch = [self.pending.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+            deadline = time.perf_counter() + self.batch_window
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            self.stats.record_batch(len(batch))
+            size = math.ceil(len(batch) / self.workers)
+            for i in range(0, len(batch), size):
+                chunk = batch[i:i + size]
+                try:
+                    self.submit_chunk(chunk)
+                except Exception as e:
+                    # Never let the dispatcher die with requests waiting on it
+                    for item in chunk:
+                        item[3].set_exception(e)
+
+    def submit_chunk(self, chunk):
+        requests = [item[:3] for item in chunk]
+        try:
+            task = self.executor.submit(analyze_batch, requests)
+        except BrokenProcessPool:
+            # A worker died during an earlier batch; these requests have not
+            # run yet, so they go to a fresh pool
+            self.restart_pool()
+            task = self.executor.submit(analyze_batch, requests)
+        task.add_done_callback(_resolver(chunk))
+
+    def close(self):
+        self.running = False
+        self.dispatcher.join()
+        # Requests still queued are turned away; running batches finish
+        while True:
+            try:
+                item = self.pending.get_nowait()
+            except queue.Empty:
+                break
+            item[3].set_exception(RuntimeError("service is shutting down"))
+        self.executor.shutdown(wait=True)
+
+
+def _resolver(chunk):
+    # Done-callback that hands each request of a chunk its own result
+    def resolve(task):
+        try:
+            results = task.result()
+        except BrokenProcessPool as e:
+            # A worker crashed while running this chunk
+            for item in chunk:
+                item[3].set_exception(e)
+            return
+        except Exception as e:
+            results = [{"error": str(e)}] * len(chunk)
+        for item, result in zip(chunk, results):
+            item[3].set_result(result)
+    return resolve
+
+
+def params_from_query(query, defaults):
+    # Query string values override the server's default parameters
+    values = defaults.to_dict()
+    for name, value in values.items():
+        if name not in query:
+            continue
+        text = query[name][-1]
+        if isinstance(value, bool):
+            values[name] = text.lower() in ("1", "true", "yes")
+        else:
+            values[name] = type(value)(text)
+    params = DetectionParams.from_dict(values)
+    if params.detector not in tlc_engine.DETECTORS:
+        raise ValueError(f"unknown detector {params.detector!r}")
+    return params
+
+
+class AnalysisHandler(BaseHTTPRequestHandler):
+    # self.server carries the service and the default parameters
+    protocol_version = "HTTP/1.1"
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/stats":
+            service = self.server.service
+            self.send_json(200, service.stats.to_dict(pending=service.pending.qsize()))
+        elif path == "/health":
+            self.send_json(200, {"status": "ok"})
+        else:
+            self.send_json(404, {"error": f"unknown endpoint {path}"})
+
+    def do_POST(self):
+        start = time.perf_counter()
+        url = urlparse(self.path)
+        if url.path != "/analyze":
+            self.send_json(404, {"error": f"unknown endpoint {url.path}"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            self.send_json(400, {"error": "invalid Content-Length header"})
+            return
+        if length <= 0 or length > MAX_BODY_BYTES:
+            self.send_json(400 if length <= 0 else 413,
+                           {"error": "body must be an encoded image of at most "
+                                     f"{MAX_BODY_BYTES} bytes"})
+            return
+        data = self.rfile.read(length)
+
+        query = parse_qs(url.query)
+        try:
+            params = params_from_query(query, self.server.default_params)
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        peaks = query.get("peaks", ["0"])[-1].lower() in ("1", "true", "yes")
+
+        service = self.server.service
+        status = None
+        try:
+            result = service.submit(data, params, peaks).result(timeout=REQUEST_TIMEOUT)
+        except queue.Full:
+            self.send_json(503, {"error": "server busy, retry later"})
+            return
+        except concurrent.futures.TimeoutError:
+            result = {"error": "analysis timed out"}
+        except BrokenProcessPool:
+            # The pool is replaced before the next batch
+            result, status = {"error": "analysis worker crashed, retry later"}, 503
+        except Exception as e:
+            # Shutting down, or no worker pool could be started
+            result, status = {"error": str(e)}, 503
+
+        error = "error" in result
+        latency = time.perf_counter() - start
+        service.stats.record_request(latency, error)
+        result["elapsed_s"] = round(latency, 4)
+        self.send_json(status or (422 if error else 200), result)
+
+    def log_message(self, format, *args):
+        # Per-request logging goes through /stats instead
+        pass
+
+
+def make_server(port=DEFAULT_PORT, service=None, default_params=None):
+    # Bound to localhost only; port 0 picks a free port
+    server = ThreadingHTTPServer(("127.0.0.1", port), AnalysisHandler)
+    server.daemon_threads = True
+    server.service = service or AnalysisService()
+    server.default_params = default_params or DetectionParams()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local TLC analysis service")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="worker processes (default: all cores)")
+    parser.add_argument("--batch-window", type=float, default=DEFAULT_BATCH_WINDOW,
+                        help="seconds to wait for more requests to batch together")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument("--library", default=None,
+                        help="reference library JSON, or 'default' for the built-in one")
+    parser.add_argument("--calibration", default=None, help="calibration JSON")
+    tlc_batch.add_param_arguments(parser)
+    args = parser.parse_args(argv)
+
+    calibration = library = None
+    if args.calibration:
+        import tlc_calibration
+        calibration = tlc_calibration.Calibration.load(args.calibration)
+    if args.library:
+        import tlc_library
+        library = (tlc_library.ReferenceLibrary() if args.library == "default"
+                   else tlc_library.ReferenceLibrary.load(args.library))
+
+    service = AnalysisService(args.workers, args.batch_window, args.max_batch,
+                              calibration, library)
+    server = make_server(args.port, service, tlc_batch.params_from_args(args))
+    print(f"Serving on http://127.0.0.1:{server.server_address[1]} "
+          f"with {service.workers} workers", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,195 @@
+"""SQLite results store for plate analyses.
+
+Every analysed plate is stored once per (image content hash, parameter
+hash), together with its spot table, so reruns over a growing folder only
+process images that have no results for the current parameters yet.
+Content hashes are remembered per file path, size and modification time,
+so unchanged files are not even re-read.
+"""
+import datetime
+import hashlib
+import json
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+STORE_VERSION = 1
+
+# Spot table column -> SQL column. Columns added by the reference library
+# and the calibration are optional and stored as NULL when absent.
+SPOT_FIELDS = {
+    "Spot #": "spot_num INTEGER",
+    "Lane": "lane INTEGER",
+    "Rf": "rf REAL",
+    "X": "x INTEGER",
+    "Y": "y INTEGER",
+    "Area": "area REAL",
+    "Saturation": "saturation REAL",
+    "Hue": "hue REAL",
+    "Value": "value REAL",
+    "Median Saturation": "median_saturation REAL",
+    "Integrated Intensity": "integrated_intensity REAL",
+    "Rel Conc": "rel_conc REAL",
+    "Compound": "compound TEXT",
+    "Candidates": "candidates INTEGER",
+    "Concentration": "concentration REAL",
+    "Calibration": "calibration TEXT",
+}
+SPOT_SQL_COLUMNS = [field.split()[0] for field in SPOT_FIELDS.values()]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS plates (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    image_hash TEXT NOT NULL,
+    params_hash TEXT NOT NULL,
+    params TEXT NOT NULL,
+    image_date TEXT,
+    processed_at TEXT NOT NULL,
+    spot_count INTEGER NOT NULL,
+    UNIQUE (image_hash, params_hash)
+);
+CREATE TABLE IF NOT EXISTS spots (
+    plate_id INTEGER NOT NULL REFERENCES plates(id) ON DELETE CASCADE,
+    {", ".join(SPOT_FIELDS.values())}
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    image_hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_plates_name ON plates(name);
+CREATE INDEX IF NOT EXISTS idx_plates_date ON plates(image_date);
+CREATE INDEX IF NOT EXISTS idx_spots_plate ON spots(plate_id);
+CREATE INDEX IF NOT EXISTS idx_spots_compound ON spots(compound);
+"""
+
+
+def file_hash(file_path, chunk_size=1 << 20):
+    # Content hash of the encoded file; no image decoding needed
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parameter_hash(params, calibration=None, library=None):
+    # Everything that changes the stored spot table is part of the key
+    settings = {"params": params.to_dict()}
+    if calibration is not None:
+        settings["calibration"] = calibration.to_dict()
+    if library is not None:
+        settings["library"] = library.to_dict()
+    text = json.dumps(settings, sort_keys=True)
+    return hashlib.blake2b(text.encode(), digest_size=20).hexdigest()
+
+
+def _sql_value(value):
+    # NumPy scalars and NaN are not SQLite types
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+class ResultStore:
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.conn = sqlite3.connect(file_path)
+        # WAL lets readers query the store while a batch keeps writing
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        self.conn.execute(f"PRAGMA user_version={STORE_VERSION}")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def image_hash(self, file_path):
+        # Cached content hash; the file is only read again after it changed
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        row = self.conn.execute("SELECT size, mtime_ns, image_hash FROM files WHERE path = ?",
+                                (path,)).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+        digest = file_hash(path)
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                              (path, stat.st_size, stat.st_mtime_ns, digest))
+        return digest
+
+    def has_results(self, image_hash, params_hash):
+        row = self.conn.execute("SELECT 1 FROM plates WHERE image_hash = ? AND params_hash = ?",
+                                (image_hash, params_hash)).fetchone()
+        return row is not None
+
+    def add_plate(self, file_path, image_hash, params_hash, params, blob_data):
+        # Stores (or replaces) one plate and all of its spots in a single
+        # transaction; returns the plate id
+        path = os.path.abspath(file_path)
+        image_date = None
+        if os.path.exists(path):
+            image_date = datetime.date.fromtimestamp(os.path.getmtime(path)).isoformat()
+        processed_at = datetime.datetime.now().isoformat(timespec="seconds")
+
+        present = [col for col in SPOT_FIELDS if col in blob_data.columns]
+        sql_columns = [SPOT_SQL_COLUMNS[list(SPOT_FIELDS).index(col)] for col in present]
+        rows = blob_data[present].astype(object).itertuples(index=False, name=None)
+
+        with self.conn:
+            self.conn.execute("DELETE FROM plates WHERE image_hash = ? AND params_hash = ?",
+                              (image_hash, params_hash))
+            cursor = self.conn.execute(
+                "INSERT INTO plates (name, path, image_hash, params_hash, params, image_date, "
+                "processed_at, spot_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (os.path.basename(path), path, image_hash, params_hash,
+                 json.dumps(params.to_dict(), sort_keys=True), image_date, processed_at,
+                 len(blob_data)))
+            plate_id = cursor.lastrowid
+            placeholders = ", ".join("?" * (len(sql_columns) + 1))
+            self.conn.executemany(
+                f"INSERT INTO spots (plate_id, {', '.join(sql_columns)}) VALUES ({placeholders})",
+                ((plate_id,) + tuple(_sql_value(v) for v in row) for row in rows))
+        return plate_id
+
+    def plates(self):
+        return pd.read_sql_query("SELECT * FROM plates ORDER BY id", self.conn)
+
+    def spots(self, plate=None, compound=None, since=None, until=None):
+        # Spot tables of stored plates, filtered by plate name, compound and
+        # image date range (ISO dates, inclusive); columns use the spot
+        # table names plus "Image" and "Date"
+        where, args = [], []
+        if plate is not None:
+            where.append("p.name = ?")
+            args.append(plate)
+        if compound is not None:
+            where.append("s.compound = ?")
+            args.append(compound)
+        if since is not None:
+            where.append("p.image_date >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("p.image_date <= ?")
+            args.append(until)
+        query = (f"SELECT p.name, p.image_date, {', '.join('s.' + c for c in SPOT_SQL_COLUMNS)} "
+                 f"FROM spots s JOIN plates p ON p.id = s.plate_id")
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY p.id, s.spot_num"
+        data = pd.read_sql_query(query, self.conn, params=args)
+        data.columns = ["Image", "Date"] + list(SPOT_FIELDS)
+        return data
@@ -0,0 +1,244 @@
+"""Tiled spot detection for very large plate scans.
+
+The image is opened as a memory map where the format allows it, and
+overlapping tiles are decoded, detected and measured one at a time per
+worker thread, so peak memory depends on the tile size rather than on
+the scan size. Everything that depends on the image as a whole (the
+intensity range of float scans, the illumination background and the
+Otsu level of the contour detector) is computed once for the scan, so
+every tile is detected on the same terms.
+"""
+import os
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import pandas as pd
+
+import tlc_engine
+
+DEFAULT_TILE_SIZE = 4096
+
+
+class TiledImage:
+    # Read-only view of a large image that hands out 8-bit BGR tiles on demand
+    def __init__(self, source):
+        if isinstance(source, np.ndarray):
+            self.array, self.rgb = source, False
+        else:
+            self.array, self.rgb = open_image_array(source)
+        self.shape = self.array.shape
+        self.height, self.width = self.shape[:2]
+        # Float and 32-bit scans are scaled to 8 bits by their global range
+        self.value_range = None
+        if self.array.dtype not in (np.uint8, np.uint16):
+            self.value_range = self.intensity_range()
+
+    def intensity_range(self):
+        low, high = np.inf, -np.inf
+        for y0, y1 in tlc_engine.row_bands(self.height, self.width):
+            band = np.asarray(self.array[y0:y1])
+            low, high = min(low, float(np.nanmin(band))), max(high, float(np.nanmax(band)))
+        return low, high
+
+    def read(self, y0, y1, x0, x1):
+        # Only the requested window is copied out of the memory map
+        tile = np.ascontiguousarray(self.array[y0:y1, x0:x1])
+        if tile.dtype == np.uint16:
+            tile = (tile >> 8).astype(np.uint8)
+        elif tile.dtype != np.uint8:
+            low, high = self.value_range
+            scale = 255.0 / (high - low) if high > low else 0.0
+            tile = np.clip((tile.astype(np.float32) - low) * scale, 0, 255).astype(np.uint8)
+
+        if tile.ndim == 2:
+            return cv2.cvtColor(tile, cv2.COLOR_GRAY2BGR)
+        if tile.shape[2] == 4:
+            return cv2.cvtColor(tile, cv2.COLOR_RGBA2BGR if self.rgb else cv2.COLOR_BGRA2BGR)
+        if self.rgb:
+            return cv2.cvtColor(tile, cv2.COLOR_RGB2BGR)
+        return tile
+
+    def gray_rows(self, y0, y1):
+        return cv2.cvtColor(self.read(y0, y1, 0, self.width), cv2.COLOR_BGR2GRAY)
+
+
+class ScanBackground(tlc_engine.Background):
+    # Illumination background of a whole scan, shrunk band by band exactly as
+    # flatten_background shrinks a whole image. Each tile is flattened with
+    # its part of this background and the scan's mean level.
+    def __init__(self, image, params):
+        super().__init__(image.height, image.width, image.gray_rows, params)
+
+
+def open_image_array(file_path):
+    # Returns (array, is_rgb). NumPy .npy files and uncompressed TIFFs are
+    # memory mapped; everything else falls back to a full OpenCV decode, as
+    # OpenCV cannot decode a region of a PNG or JPEG, so memory then grows
+    # with the scan instead of the tile size.
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".npy":
+        # Saved from OpenCV, so already in BGR order
+        return np.load(file_path, mmap_mode="r"), False
+
+    if ext in (".tif", ".tiff"):
+        try:
+            import tifffile
+        except ImportError:
+            tifffile = None
+        if tifffile is not None:
+            try:
+                return tifffile.memmap(file_path, mode="r"), True
+            except (ValueError, OSError):
+                # Compressed or non-contiguous TIFF; decode it below instead
+                pass
+
+    img = cv2.imread(file_path)
+    if img is None:
+        raise ValueError(f"failed to load image {file_path}")
+    hint = " (install tifffile to map uncompressed TIFFs)" if ext in (".tif", ".tiff") else ""
+    warnings.warn(f"{file_path}: decoded as a whole, so memory use is not bounded by the "
+                  f"tile size; save very large scans as uncompressed TIFF or .npy{hint}",
+                  RuntimeWarning)
+    return img, False
+
+
+def tile_grid(height, width, tile_size):
+    # Non-overlapping core regions that cover the image
+    for y0 in range(0, height, tile_size):
+        for x0 in range(0, width, tile_size):
+            yield y0, min(y0 + tile_size, height), x0, min(x0 + tile_size, width)
+
+
+def default_overlap(params):
+    # Tiles are read with a margin of at least one maximum spot diameter, so
+    # every spot owned by a tile lies completely inside the pixels it read
+    return int(np.ceil(2 * np.sqrt(params.max_area / np.pi))) + 2
+
+
+def preprocess_tile(image, region, params, background=None):
+    # Detection image of one region of the scan, and the BGR tile it came from
+    y0, y1, x0, x1 = region
+    tile = image.read(y0, y1, x0, x1)
+    region_background = (background, y0, x0) if background is not None else None
+    return tlc_engine.preprocess(tile, params, background=region_background), tile
+
+
+def otsu_level(histogram):
+    # Otsu's threshold of a 256-bin histogram, as cv2.THRESH_OTSU picks it
+    # for a single image
+    p = histogram / max(histogram.sum(), 1)
+    weight = np.cumsum(p)
+    mean = np.cumsum(p * np.arange(len(p)))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mean[-1] * weight - mean) ** 2 / (weight * (1 - weight))
+    return int(np.argmax(np.nan_to_num(between)))
+
+
+def scan_otsu_level(image, cores, params, background, executor):
+    # Otsu level over every pixel of the scan, from the histograms of the
+    # preprocessed tile cores
+    def histogram(core):
+        detection_gray = preprocess_tile(image, core, params, background)[0]
+        return cv2.calcHist([detection_gray], [0], None, [256], [0, 256]).ravel()
+    return otsu_level(sum(executor.map(histogram, cores)))
+
+
+def detect_tile(image, core, overlap, params, background=None, level=None):
+    y0, y1, x0, x1 = core
+    ry0, ry1 = max(0, y0 - overlap), min(image.height, y1 + overlap)
+    rx0, rx1 = max(0, x0 - overlap), min(image.width, x1 + overlap)
+    detection_gray, tile = preprocess_tile(image, (ry0, ry1, rx0, rx1), params, background)
+
+    if level is not None:
+        keypoints, areas = tlc_engine.find_contour_keypoints(detection_gray, params, level)
+    else:
+        keypoints, areas = tlc_engine.run_detector(detection_gray, params)
+    blob_data = tlc_engine.extract_spot_features(tile, keypoints, params, areas)
+
+    # Keep only spots whose center lies in this tile's core; the neighbouring
+    # tile owns the rest, which removes seam duplicates by construction
+    xs = blob_data["X"].to_numpy() + rx0
+    ys = blob_data["Y"].to_numpy() + ry0
+    owned = (xs >= x0) & (xs < x1) & (ys >= y0) & (ys < y1)
+    blob_data = blob_data[owned].copy()
+    blob_data["X"] = xs[owned]
+    blob_data["Y"] = ys[owned]
+
+    owned_keypoints = [keypoints[i - 1] for i in blob_data["Spot #"]]
+    owned_keypoints = [cv2.KeyPoint(kp.pt[0] + rx0, kp.pt[1] + ry0, kp.size)
+                       for kp in owned_keypoints]
+    return owned_keypoints, blob_data
+
+
+def merge_seam_duplicates(keypoints, blob_data, seams_x, seams_y, tolerance):
+    # Safety net for spots larger than the overlap, which can be found with
+    # slightly different centers on both sides of a seam. Only spots near a
+    # seam are compared, keeping the larger detection of each close pair.
+    if len(blob_data) < 2:
+        return keypoints, blob_data
+
+    xs = blob_data["X"].to_numpy()
+    ys = blob_data["Y"].to_numpy()
+    near = np.zeros(len(xs), dtype=bool)
+    if len(seams_x):
+        near |= np.abs(xs[:, None] - seams_x[None, :]).min(axis=1) < tolerance
+    if len(seams_y):
+        near |= np.abs(ys[:, None] - seams_y[None, :]).min(axis=1) < tolerance
+    candidates = np.flatnonzero(near)
+    if len(candidates) < 2:
+        return keypoints, blob_data
+
+    cx, cy = xs[candidates], ys[candidates]
+    close = np.hypot(cx[:, None] - cx[None, :], cy[:, None] - cy[None, :]) < tolerance
+    close = np.triu(close, k=1)
+    areas = blob_data["Area"].to_numpy()[candidates]
+    drop = set()
+    for i, j in zip(*np.nonzero(close)):
+        if candidates[i] in drop or candidates[j] in drop:
+            continue
+        drop.add(candidates[j] if areas[i] >= areas[j] else candidates[i])
+
+    keep = np.ones(len(xs), dtype=bool)
+    keep[list(drop)] = False
+    return [kp for kp, k in zip(keypoints, keep) if k], blob_data[keep]
+
+
+def detect_spots_tiled(source, params, tile_size=DEFAULT_TILE_SIZE, overlap=None, workers=None):
+    # Same outputs as tlc_engine.detect_spots, with tiles detected in
+    # parallel threads (OpenCV releases the GIL); source is a path or array
+    image = source if isinstance(source, TiledImage) else TiledImage(source)
+    if overlap is None:
+        overlap = default_overlap(params)
+    cores = list(tile_grid(image.height, image.width, tile_size))
+    background = ScanBackground(image, params) if params.background_correction else None
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        # Otsu on a single tile would pick a different level per tile
+        level = None
+        if params.detector == "contours" and params.threshold_min >= params.threshold_max:
+            level = scan_otsu_level(image, cores, params, background, executor)
+        results = list(executor.map(
+            lambda core: detect_tile(image, core, overlap, params, background, level), cores))
+
+    keypoints = [kp for tile_keypoints, _ in results for kp in tile_keypoints]
+    tables = [blob_data for _, blob_data in results if len(blob_data) > 0]
+    if tables:
+        blob_data = pd.concat(tables, ignore_index=True)
+    else:
+        blob_data = tlc_engine.spot_table()
+
+    seams_x = np.arange(tile_size, image.width, tile_size)
+    seams_y = np.arange(tile_size, image.height, tile_size)
+    keypoints, blob_data = merge_seam_duplicates(keypoints, blob_data, seams_x, seams_y,
+                                                 tolerance=max(2.0, overlap / 4))
+
+    # Positions are global now, so recompute the image-relative columns
+    blob_data = blob_data.reset_index(drop=True)
+    xs = blob_data["X"].to_numpy()
+    ys = blob_data["Y"].to_numpy()
+    blob_data["Spot #"] = np.arange(1, len(blob_data) + 1, dtype=tlc_engine.SPOT_DTYPES["Spot #"])
+    blob_data["Rf"] = tlc_engine.rf_values(ys, image.height)
+    blob_data["Lane"] = tlc_engine.lane_numbers(xs, image.width, params.num_lanes)
+    return keypoints, blob_data, image.shape
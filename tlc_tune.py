@@ -0,0 +1,301 @@
+"""Automatic tuning of the detection parameters.
+
+    python tlc_tune.py plates/ --truth annotated.csv -o best_params.json
+    python tlc_tune.py --synthetic 4 --table scores.csv
+
+Candidate parameter sets from a grid, refined around the best one, are
+scored against plates with known spots. These are either annotated plates,
+whose true spots are given in a CSV laid out like the batch output
+(Image, X, Y and optionally Area or Radius), or synthetic plates from
+tlc_synthetic. Candidates that share their preprocessing (threshold,
+inversion, background correction) go to the same worker, so preprocessed
+plates are computed once and reused from the worker's StageCache. The best
+set is written as a parameter file for `OTLC.py --params`, and every
+candidate with its scores and detection time goes to an optional table.
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+
+import cv2
+import numpy as np
+import pandas as pd
+
+import tlc_batch
+import tlc_engine
+import tlc_synthetic
+
+# Coarse search space; "threshold" holds (threshold_min, threshold_max)
+# pairs, (0, 0) meaning no threshold
+DEFAULT_GRID = OrderedDict([
+    ("min_area", [25, 50, 100, 200]),
+    ("max_area", [2000, 10000, 50000]),
+    ("min_circularity", [0.3, 0.5, 0.7]),
+    ("threshold", [(0, 0), (50, 255), (100, 255)]),
+    ("invert_image", [False, True]),
+])
+
+TUNED_FIELDS = ["min_area", "max_area", "min_circularity", "threshold_min", "threshold_max",
+                "invert_image"]
+
+# Fields refined between the best value and its tried neighbours
+REFINE_FIELDS = ["min_area", "max_area", "min_circularity", "threshold_min"]
+
+METRICS = ("f1", "recall", "precision")
+
+# Match distance in pixels for annotated spots without a size
+DEFAULT_TOLERANCE = 10.0
+
+# Worker process cache of plate images and preprocessing stages
+_cache = None
+
+
+def _init_worker():
+    global _cache
+    tlc_batch._init_worker()
+    _cache = tlc_engine.StageCache()
+
+
+def load_truth(truth_file, paths):
+    # Annotated spots per image, matched on the Image column by file name.
+    # Returns [(path, truth)] for the images that have annotations.
+    spots = pd.read_csv(truth_file)
+    missing = {"Image", "X", "Y"} - set(spots.columns)
+    if missing:
+        raise ValueError(f"{truth_file} lacks columns {sorted(missing)}")
+    if "Radius" not in spots and "Area" in spots:
+        spots["Radius"] = np.sqrt(spots["Area"] / np.pi)
+    groups = {image: table.reset_index(drop=True) for image, table in spots.groupby("Image")}
+    return [(path, groups[os.path.basename(path)]) for path in paths
+            if os.path.basename(path) in groups]
+
+
+def synthetic_plates(count, workdir, megapixels=2.0, dark_spots=False, seed=0):
+    # Writes count synthetic plates to workdir; returns [(path, truth)]
+    plates = []
+    for i in range(count):
+        spec = tlc_synthetic.PlateSpec.for_megapixels(megapixels, dark_spots=dark_spots,
+                                                      seed=seed + i)
+        img, truth = tlc_synthetic.generate_plate(spec)
+        path = os.path.join(workdir, f"synthetic_{i}.png")
+        cv2.imwrite(path, img)
+        plates.append((path, truth))
+    return plates
+
+
+def complete_truth(truth, img, params):
+    # Fill in what match_spots reports on but annotations may leave out
+    height, width = img.shape[:2]
+    truth = truth.copy()
+    if "Rf" not in truth:
+        truth["Rf"] = tlc_engine.rf_values(truth["Y"].to_numpy(), height)
+    if "Lane" not in truth:
+        truth["Lane"] = tlc_engine.lane_numbers(truth["X"].to_numpy(np.int64), width,
+                                                params.num_lanes)
+    if "Area" not in truth:
+        truth["Area"] = np.pi * truth["Radius"] ** 2 if "Radius" in truth else np.nan
+    return truth
+
+
+def candidate_key(params):
+    return tuple(getattr(params, name) for name in TUNED_FIELDS)
+
+
+def preprocessing_key(params):
+    # Candidates with equal keys share every cached preprocessing stage
+    return (params.threshold_min, params.threshold_max, params.invert_image,
+            params.background_correction,
+            params.max_area if params.background_correction else None)
+
+
+def grid_candidates(base, grid=DEFAULT_GRID):
+    names = list(grid)
+    for values in itertools.product(*(grid[name] for name in names)):
+        changes = dict(zip(names, values))
+        if "threshold" in changes:
+            changes["threshold_min"], changes["threshold_max"] = changes.pop("threshold")
+        params = replace(base, **changes)
+        if params.min_area < params.max_area:
+            yield params
+
+
+def refinements(best, tried):
+    # Values halfway between the best value of each field and its nearest
+    # tried neighbours, with the other fields of the best set
+    for name in REFINE_FIELDS:
+        if name == "threshold_min" and best.threshold_min >= best.threshold_max:
+            continue
+        value = getattr(best, name)
+        values = sorted({getattr(params, name) for params in tried})
+        i = values.index(value)
+        for neighbour in values[max(0, i - 1):i] + values[i + 1:i + 2]:
+            middle = (value + neighbour) / 2
+            middle = int(round(middle)) if isinstance(value, int) else round(middle, 3)
+            if middle in values:
+                continue
+            params = replace(best, **{name: middle})
+            if params.min_area < params.max_area:
+                yield params
+
+
+def score_candidates(candidates, plates, tolerance=None):
+    # One pool task: candidates that share their preprocessing, each scored
+    # on every plate. ms is the mean detection time per plate; preprocessing
+    # is only paid by the first candidate that needs it.
+    cache = _cache if _cache is not None else tlc_engine.StageCache()
+    rows = []
+    for params in candidates:
+        scores = []
+        seconds = 0.0
+        for path, truth in plates:
+            img = tlc_engine.load_image(path, cache=cache)
+            if img is None:
+                raise ValueError(f"{path}: failed to load image")
+            image_key = tlc_engine.image_key_for_path(path)
+            start = time.perf_counter()
+            _, blob_data = tlc_engine.detect_spots(img, params, cache=cache, image_key=image_key)
+            seconds += time.perf_counter() - start
+            truth = complete_truth(truth, img, params)
+            scores.append(tlc_synthetic.match_spots(
+                truth, blob_data, tolerance if "Radius" not in truth else None))
+
+        row = {name: getattr(params, name) for name in TUNED_FIELDS}
+        for metric in METRICS:
+            row[metric] = round(float(np.mean([s[metric] for s in scores])), 4)
+        rf_errors = [s["rf_error"] for s in scores if "rf_error" in s]
+        row["rf_error"] = round(float(np.mean(rf_errors)), 4) if rf_errors else np.nan
+        row["spots"] = round(float(np.mean([s["found_spots"] for s in scores])), 1)
+        row["ms"] = round(seconds / len(plates) * 1000.0, 2)
+        rows.append(row)
+    return rows
+
+
+def evaluate(executor, candidates, plates, workers, tolerance=None):
+    # Candidates are grouped by preprocessing and the groups cut into enough
+    # chunks to keep every worker busy
+    groups = OrderedDict()
+    for params in candidates:
+        groups.setdefault(preprocessing_key(params), []).append(params)
+    size = max(1, math.ceil(len(candidates) / (workers * 4)))
+    tasks = [group[i:i + size] for group in groups.values() for i in range(0, len(group), size)]
+    futures = [executor.submit(score_candidates, task, plates, tolerance) for task in tasks]
+    return [row for future in futures for row in future.result()]
+
+
+def params_from_row(row, base):
+    # Tuned fields of a table row on top of the base parameters
+    defaults = base.to_dict()
+    return replace(base, **{name: type(defaults[name])(row[name]) for name in TUNED_FIELDS})
+
+
+def rank(rows, metric):
+    table = pd.DataFrame(rows)
+    # Ties go to the smaller Rf error, then to the faster candidate
+    return table.sort_values([metric, "rf_error", "ms"], ascending=[False, True, True],
+                             kind="stable", na_position="last").reset_index(drop=True)
+
+
+def tune(plates, base, grid=DEFAULT_GRID, workers=None, rounds=2, metric="f1",
+         tolerance=DEFAULT_TOLERANCE, log=sys.stderr):
+    # Grid search followed by up to `rounds` refinement rounds. plates is a
+    # list of (path, truth). Returns (best DetectionParams, ranked table).
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        candidates = list(grid_candidates(base, grid))
+        rows = evaluate(executor, candidates, plates, workers, tolerance)
+        for row in rows:
+            row["stage"] = "grid"
+        tried = candidates
+        seen = {candidate_key(params) for params in tried}
+        print(f"Grid: {len(candidates)} candidates on {len(plates)} plates "
+              f"in {time.perf_counter() - start:.1f}s", file=log)
+
+        for round_number in range(1, rounds + 1):
+            best = params_from_row(rank(rows, metric).iloc[0], base)
+            new = []
+            for params in refinements(best, tried):
+                if candidate_key(params) not in seen:
+                    seen.add(candidate_key(params))
+                    new.append(params)
+            if not new:
+                break
+            new_rows = evaluate(executor, new, plates, workers, tolerance)
+            for row in new_rows:
+                row["stage"] = f"refine {round_number}"
+            rows += new_rows
+            tried = tried + new
+            print(f"Refinement {round_number}: {len(new)} candidates "
+                  f"({time.perf_counter() - start:.1f}s total)", file=log)
+
+    table = rank(rows, metric)
+    return params_from_row(table.iloc[0], base), table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune detection parameters on plates with "
+                                                 "known spots")
+    parser.add_argument("inputs", nargs="*", help="annotated plate images, directories or globs")
+    parser.add_argument("--truth", default=None,
+                        help="CSV of the true spots (Image, X, Y and optionally Area or Radius), "
+                             "e.g. a cleaned-up batch output")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="also tune on this many synthetic plates")
+    parser.add_argument("--megapixels", type=float, default=2.0, help="synthetic plate size")
+    parser.add_argument("--dark-spots", action="store_true",
+                        help="synthetic plates with dark spots on a light background")
+    parser.add_argument("-o", "--output", default="tlc_params.json",
+                        help="best parameters as a JSON file for --params")
+    parser.add_argument("--table", default=None, help="write every candidate's scores to this CSV")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="worker processes (default: all cores)")
+    parser.add_argument("--rounds", type=int, default=2, help="refinement rounds after the grid")
+    parser.add_argument("--metric", choices=METRICS, default="f1")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="match distance in pixels for annotated spots without a size")
+    parser.add_argument("--top", type=int, default=10, help="candidates to print")
+    tlc_batch.add_param_arguments(parser)
+    args = parser.parse_args(argv)
+
+    plates = []
+    if args.inputs:
+        if not args.truth:
+            parser.error("annotated plates need --truth")
+        plates = load_truth(args.truth, tlc_batch.find_images(args.inputs))
+        if not plates:
+            parser.error(f"no images with annotations in {args.truth}")
+    if not plates and not args.synthetic:
+        parser.error("give annotated plates with --truth, or --synthetic N")
+
+    base = tlc_batch.params_from_args(args)
+    with tempfile.TemporaryDirectory() as workdir:
+        plates += synthetic_plates(args.synthetic, workdir, args.megapixels, args.dark_spots)
+        best, table = tune(plates, base, workers=args.workers, rounds=args.rounds,
+                           metric=args.metric, tolerance=args.tolerance)
+
+    if args.table:
+        table.to_csv(args.table, index=False)
+    print(table.head(args.top).to_string(index=False))
+    # A best score of 0 means no candidate found a single true spot (e.g. the
+    # wrong polarity throughout); such a parameter file would only mislead
+    if not table[args.metric].iloc[0] > 0:
+        print(f"error: no candidate found any true spot (best {args.metric} is 0); "
+              f"nothing written to {args.output}", file=sys.stderr)
+        return 1
+
+    with open(args.output, "w") as f:
+        json.dump(best.to_dict(), f, indent=2)
+    print(f"Best parameters written to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,176 @@
+"""Watch-folder mode: analyze plate images as they arrive.
+
+The folder is polled for image files whose size and modification time
+have stopped changing (phones and network shares write files in pieces).
+Ready files wait in a bounded queue and are handed to a bounded process
+pool; when both are full the scanner stops admitting files, which simply
+stay on disk until a later scan. Results are written as each image
+finishes, and latency and queue-depth statistics are reported
+periodically to help size the worker count.
+"""
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
+
+import numpy as np
+
+import tlc_batch
+
+DEFAULT_POLL_INTERVAL = 1.0
+# A file must keep the same size and mtime this long before it is read
+DEFAULT_SETTLE_TIME = 2.0
+DEFAULT_REPORT_INTERVAL = 60.0
+
+
+class WatchStats:
+    # Rolling counters for the periodic report; latency is measured from
+    # the moment a file was found ready to the moment its results were written
+    def __init__(self, window=1000):
+        self.start = time.perf_counter()
+        self.done = 0
+        self.failed = 0
+        self.skipped = 0
+        self.latencies = deque(maxlen=window)
+        self.queue_depths = deque(maxlen=window)
+        self.max_queue_depth = 0
+
+    def record_depth(self, depth):
+        self.queue_depths.append(depth)
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def record_result(self, latency, failed=False):
+        self.done += 1
+        self.failed += failed
+        self.latencies.append(latency)
+
+    def summary(self, queued, in_flight):
+        elapsed = time.perf_counter() - self.start
+        rate = 60.0 * self.done / elapsed if elapsed > 0 else 0.0
+        text = (f"{self.done} images ({self.failed} failed, {self.skipped} skipped), "
+                f"{rate:.1f} images/min, queue {queued} (max {self.max_queue_depth}), "
+                f"in flight {in_flight}")
+        if self.latencies:
+            p50, p95 = np.percentile(np.array(self.latencies), [50, 95])
+            text += f", latency p50 {p50:.2f}s p95 {p95:.2f}s"
+        return text
+
+
+class FolderScanner:
+    # Polls a folder and returns image files that are complete and new
+    def __init__(self, folder, settle_time=DEFAULT_SETTLE_TIME):
+        self.folder = folder
+        self.settle_time = settle_time
+        self.candidates = {}   # path -> (size, mtime_ns, first seen unchanged)
+        self.seen = set()      # (path, size, mtime_ns) already admitted
+
+    def scan(self, limit=None):
+        # At most limit ready files, oldest first; the rest stay for later scans
+        now = time.monotonic()
+        ready = []
+        try:
+            entries = list(os.scandir(self.folder))
+        except OSError:
+            return ready
+        for entry in entries:
+            if not entry.name.lower().endswith(tlc_batch.IMAGE_EXTENSIONS):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            path = entry.path
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if (path,) + signature in self.seen:
+                continue
+            previous = self.candidates.get(path)
+            if previous is None or previous[:2] != signature:
+                self.candidates[path] = signature + (now,)
+            elif now - previous[2] >= self.settle_time and stat.st_size > 0:
+                ready.append((stat.st_mtime_ns, path, signature))
+
+        ready.sort()
+        ready = ready[:limit] if limit is not None else ready
+        for _, path, signature in ready:
+            self.seen.add((path,) + signature)
+            del self.candidates[path]
+        return [path for _, path, _ in ready]
+
+
+def watch_folder(folder, params, output, workers=None, peaks_output=None, calibration=None,
+                 library=None, store=None, poll_interval=DEFAULT_POLL_INTERVAL,
+                 settle_time=DEFAULT_SETTLE_TIME, max_queue=None,
+                 report_interval=DEFAULT_REPORT_INTERVAL, max_images=None, log=sys.stderr):
+    # Runs until interrupted (or until max_images results were written);
+    # results are appended to output. Returns the final WatchStats.
+    workers = workers or os.cpu_count() or 1
+    max_queue = max_queue or 4 * workers
+    # A couple of images per worker keeps the pool busy between polls
+    max_in_flight = 2 * workers
+
+    writer = tlc_batch.ResultWriter(output, params, peaks_output, calibration, library, store,
+                                    append=True)
+    scanner = FolderScanner(folder, settle_time)
+    stats = WatchStats()
+    queued = deque()   # (path, ready time, image hash)
+    in_flight = {}     # future -> (path, ready time, image hash)
+    job = partial(tlc_batch.process_image, params=params, peaks=peaks_output is not None)
+    next_report = time.perf_counter() + report_interval
+
+    print(f"Watching {folder} with {workers} workers", file=log)
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=tlc_batch._init_worker)
+    try:
+        while max_images is None or stats.done + stats.skipped < max_images:
+            # Backpressure: only admit what the bounded queue can hold
+            for path in scanner.scan(limit=max_queue - len(queued)):
+                image_hash = None
+                if store is not None:
+                    try:
+                        image_hash = store.image_hash(path)
+                    except OSError:
+                        pass
+                    if image_hash is not None and writer.is_stored(image_hash):
+                        stats.skipped += 1
+                        continue
+                queued.append((path, time.perf_counter(), image_hash))
+
+            while queued and len(in_flight) < max_in_flight:
+                item = queued.popleft()
+                in_flight[executor.submit(job, item[0])] = item
+            stats.record_depth(len(queued))
+
+            if in_flight:
+                finished, _ = wait(in_flight, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            else:
+                finished = ()
+                time.sleep(poll_interval)
+
+            for future in finished:
+                path, ready_time, image_hash = in_flight.pop(future)
+                try:
+                    _, blob_data, peak_data, error, timings = future.result()
+                except Exception as e:
+                    error, timings = str(e), None
+                if error is None:
+                    writer.write(path, blob_data, peak_data, image_hash, timings)
+                else:
+                    writer.add_timings(path, timings)
+                    print(f"{path}: {error}", file=log)
+                stats.record_result(time.perf_counter() - ready_time, failed=error is not None)
+
+            if time.perf_counter() >= next_report:
+                print(stats.summary(len(queued), len(in_flight)), file=log)
+                print(f"Stage time: {writer.stage_totals.summary()}", file=log)
+                next_report = time.perf_counter() + report_interval
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Queued images are dropped (cancel_futures needs Python 3.9)
+        for future in in_flight:
+            future.cancel()
+        executor.shutdown(wait=True)
+        writer.close()
+        print(stats.summary(len(queued), len(in_flight)), file=log)
+    return stats